@@ -2,7 +2,10 @@ from flask import Flask, request, jsonify, render_template, Response
 from flask_cors import CORS
 import duckdb
 import pandas as pd
+import numpy as np
 import os
+import itertools
+import re
 import google.generativeai as genai
 from dotenv import load_dotenv
 import cloudinary
@@ -13,6 +16,19 @@ from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 from datetime import datetime, timedelta
 from functools import wraps
+import urllib.request
+import uuid
+from dataset_store import DatasetStore, derived_dataset_id, new_dataset_hasher
+from profile_cache import ProfileCache
+from ingest import ingest_file, ingest_segment, remove_files, build_duckdb_file, build_partitions, partitions_relation_sql, spool_stream, sql_string, sql_identifier
+from remote_cache import RemoteFileCache
+from jobs import IngestJobQueue, BackgroundTasks, PENDING_STATES, run_every
+from storage import create_storage_backend
+from workspaces import WorkspaceStore
+from uploads import UploadSessionStore
+from tiering import DatasetTiering
+from quotas import UsageIndex
+from profiling import profile_relation, profile_database_table, encode_sketches, decode_sketches, mark_estimated
 
 # Load environment variables from .env file
 load_dotenv()
@@ -28,6 +44,71 @@ print(mongodb_uri)
 jwt_secret = os.getenv("JWT_SECRET", "your-secret-key-change-this")
 database_name = "dashboard_agent"
 
+# Local directory holding the columnar copy of every ingested dataset
+dataset_dir = os.getenv("DATASET_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+# Optional DuckDB memory cap per worker (e.g. "2GB"); larger queries spill to disk
+duckdb_memory_limit = os.getenv("DUCKDB_MEMORY_LIMIT")
+# Threads DuckDB may use per worker for loading and querying (defaults to all cores)
+duckdb_threads = int(os.getenv("DUCKDB_THREADS", "0")) or None
+# Uploads are streamed to disk in chunks of this size (default 8 MB)
+ingest_chunk_size = int(os.getenv("INGEST_CHUNK_SIZE", str(8 * 1024 * 1024)))
+# Peak memory DuckDB may use while ingesting a file, whatever its size
+ingest_memory_limit = os.getenv("INGEST_MEMORY_LIMIT", "1GB")
+# Datasets with at least this many rows also get a copy partitioned by a date or
+# category column, so filtered queries read only matching partitions (0 disables)
+partition_min_rows = int(os.getenv("PARTITION_MIN_ROWS", "1000000"))
+# Background threads per worker running upload ingest jobs
+ingest_workers = int(os.getenv("INGEST_WORKERS", "2"))
+# Seconds between heartbeats of pending ingest jobs; a job whose worker has exited,
+# or has missed four heartbeats, is marked failed
+ingest_heartbeat_seconds = int(os.getenv("INGEST_HEARTBEAT_SECONDS", "30"))
+# Number of dataset profiles (schema_info) kept in memory per worker
+profile_cache_entries = int(os.getenv("PROFILE_CACHE_ENTRIES", "256"))
+# How profiles count distinct values: "approximate" estimates them from HyperLogLog
+# sketches (within 2.4% for 99.7% of columns) in the profile's single scan; "exact"
+# counts them in an aggregate query, about twice as slow, and sketches in a second scan
+profile_distinct_counts = os.getenv("PROFILE_DISTINCT_COUNTS", "approximate")
+# Tables with more rows than this are first profiled from a sample of about this many
+# rows, and profiled exactly in the background afterwards (0 disables sampling)
+profile_row_budget = int(os.getenv("PROFILE_ROW_BUDGET", "2000000"))
+# Seconds the first profile of a table may take; a slower one is interrupted and
+# estimated from a tenth of the rows instead (0 disables)
+profile_time_budget = float(os.getenv("PROFILE_TIME_BUDGET_SECONDS", "0"))
+# Processes a wide table's columns are split across when it is profiled. Every server
+# worker keeps a pool of them, so the default is this worker's share of the cores
+# (WEB_CONCURRENCY is gunicorn's worker count), at most 4
+profile_workers = int(os.getenv("PROFILE_WORKERS", "0")) or max(
+    1, min(4, (os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY", "1")))
+)
+# Seconds the pool is kept after its last profile; 0 stops it after every profile
+profile_pool_idle_seconds = float(os.getenv("PROFILE_POOL_IDLE_SECONDS", "300"))
+# Local cache of remote dataset files, revalidated with ETag / Last-Modified (default 10 GB)
+remote_cache_dir = os.getenv("REMOTE_CACHE_DIR", os.path.join(dataset_dir, "_remote_cache"))
+remote_cache_max_bytes = int(os.getenv("REMOTE_CACHE_MAX_BYTES", str(10 * 1024 * 1024 * 1024)))
+# Where uploaded datasets are stored: "cloudinary" or "local" (a local disk or shared volume)
+storage_backend = os.getenv("STORAGE_BACKEND", "cloudinary")
+local_storage_dir = os.getenv("LOCAL_STORAGE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "storage"))
+# Chunked uploads: default chunk size offered to clients and the largest chunk a request may carry
+upload_chunk_size = int(os.getenv("UPLOAD_CHUNK_SIZE", str(16 * 1024 * 1024)))
+upload_max_chunk_size = int(os.getenv("UPLOAD_MAX_CHUNK_SIZE", str(64 * 1024 * 1024)))
+# Chunked uploads that receive nothing for this long are deleted, with their chunks (default 1 day)
+upload_session_ttl = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", str(24 * 3600)))
+# Storage each signed-in user may fill in the storage backend (default 10 GB), and the
+# allowance shared by all uploads without a sign-in (default 1 GB); 0 means no limit
+user_quota_bytes = int(os.getenv("USER_QUOTA_BYTES", str(10 * 1024 * 1024 * 1024)))
+anonymous_quota_bytes = int(os.getenv("ANONYMOUS_QUOTA_BYTES", str(1024 * 1024 * 1024)))
+# Tiering: datasets unused for TIER_HOT_SECONDS keep only their Parquet copy on local disk,
+# and after TIER_WARM_SECONDS only the storage backend holds them
+tier_hot_seconds = int(os.getenv("TIER_HOT_SECONDS", str(24 * 3600)))
+tier_warm_seconds = int(os.getenv("TIER_WARM_SECONDS", str(30 * 24 * 3600)))
+# Local disk budget for dataset files; least recently used datasets are demoted beyond it (0 disables)
+local_dataset_max_bytes = int(os.getenv("LOCAL_DATASET_MAX_BYTES", "0"))
+# Seconds between housekeeping passes in each worker, which expire abandoned uploads and
+# move idle datasets down the tiers (0 disables the background pass)
+tiering_interval = int(os.getenv("TIERING_INTERVAL_SECONDS", "3600"))
+# Users (by user_id) allowed to use the /admin endpoints
+admin_user_ids = {user_id.strip() for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()}
+
 # Cloudinary configuration
 cloudinary.config(
     cloud_name=cloudinary_cloud_name,
@@ -36,15 +117,10 @@ cloudinary.config(
     secure=True
 )
 
-# MongoDB connection
-try:
-    client = MongoClient(mongodb_uri)
-    db = client[database_name]
-    users_collection = db.users
-    print("✅ Connected to MongoDB successfully")
-except Exception as e:
-    print(f"❌ Error connecting to MongoDB: {e}")
-    db = None
+# MongoDB connection, made by start_services()
+client = None
+db = None
+users_collection = None
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -52,6 +128,81 @@ app = Flask(__name__)
 # Enable Cross-Origin Resource Sharing (CORS) for all routes
 cors = CORS(app, origins="*")
 
+dataset_store = DatasetStore(dataset_dir)
+usage_index = UsageIndex(dataset_dir)
+profile_cache = ProfileCache(max_entries=profile_cache_entries)
+ingest_jobs = IngestJobQueue(
+    dataset_store,
+    max_workers=ingest_workers,
+    heartbeat_seconds=ingest_heartbeat_seconds,
+    stale_seconds=4 * ingest_heartbeat_seconds,
+    on_failed=lambda dataset_id: release_ingest_charges(dataset_id)
+)
+# Exact profiles replacing sampled ones are computed one at a time per worker
+profile_jobs = BackgroundTasks(max_workers=1, name="profile")
+remote_cache = RemoteFileCache(
+    remote_cache_dir,
+    max_bytes=remote_cache_max_bytes,
+    hasher_factory=new_dataset_hasher,
+    chunk_size=ingest_chunk_size
+)
+storage = create_storage_backend(storage_backend, local_storage_dir)
+workspace_store = WorkspaceStore(dataset_dir)
+upload_sessions = UploadSessionStore(dataset_dir, max_chunk_size=upload_max_chunk_size)
+tiering = DatasetTiering(
+    dataset_store,
+    hot_seconds=tier_hot_seconds,
+    warm_seconds=tier_warm_seconds,
+    max_local_bytes=local_dataset_max_bytes
+)
+
+def stored_charges():
+    """
+    Yield (user_id, dataset_id, stored_bytes) for every owner of every stored dataset.
+    """
+    for dataset_id in dataset_store.list_datasets():
+        metadata = dataset_store.read_metadata(dataset_id)
+        if metadata and "stored_bytes" in metadata:
+            for owner in metadata.get("owners", []):
+                yield owner, dataset_id, metadata["stored_bytes"]
+
+def run_housekeeping():
+    """
+    Delete abandoned upload sessions, releasing what they were charged, then
+    run a tiering pass. Returns the tiering moves.
+    """
+    for session in upload_sessions.expire(upload_session_ttl):
+        usage_index.release(session.get("owner", ANONYMOUS_USER), upload_charge_key(session["upload_id"]))
+        print(f"🧹 Deleted upload {session['upload_id'][:12]}, unused for {upload_session_ttl} seconds")
+    return tiering.run()
+
+def start_services():
+    """
+    Connect to MongoDB, index the storage charged to users if no index exists
+    yet, and start this worker's background housekeeping pass.
+    """
+    global client, db, users_collection
+    try:
+        client = MongoClient(mongodb_uri)
+        db = client[database_name]
+        users_collection = db.users
+        print("✅ Connected to MongoDB successfully")
+    except Exception as e:
+        print(f"❌ Error connecting to MongoDB: {e}")
+        db = None
+    if not usage_index.exists():
+        usage_index.rebuild(stored_charges())
+    if tiering_interval:
+        run_every(tiering_interval, run_housekeeping, "housekeeping")
+
+# Profiling processes are spawned, and when the app runs as a script they import this
+# file again as __mp_main__; they only profile, so they skip the connection and threads
+if __name__ != "__mp_main__":
+    start_services()
+
+# Owner recorded for uploads made without a sign-in
+ANONYMOUS_USER = "anonymous"
+
 # JWT Token validation decorator
 def token_required(f):
     @wraps(f)
@@ -74,6 +225,58 @@ def token_required(f):
         return f(current_user_id, *args, **kwargs)
     return decorated
 
+# Admin validation decorator, on top of the JWT token check
+def admin_required(f):
+    @token_required
+    def decorated(current_user_id, *args, **kwargs):
+        if current_user_id not in admin_user_ids:
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    return wraps(f)(decorated)
+
+# JWT Token validation for endpoints that also serve requests without a sign-in
+def token_optional(f):
+    """
+    Like token_required, but requests without an Authorization header are
+    made by ANONYMOUS_USER, whose uploads share one storage quota. A token
+    that is sent must still be valid, so an expired sign-in is never
+    treated as anonymous.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not request.headers.get('Authorization'):
+            return f(ANONYMOUS_USER, *args, **kwargs)
+        return token_required(f)(*args, **kwargs)
+    return decorated
+
+def user_quota(user_id):
+    return anonymous_quota_bytes if user_id == ANONYMOUS_USER else user_quota_bytes
+
+def reserve_quota(user_id, key, new_bytes, releases=None):
+    """
+    Charge new_bytes to the user under key, as UsageIndex.reserve does. Returns
+    the error response if that would take them over their quota, or None.
+    """
+    quota = user_quota(user_id)
+    if usage_index.reserve(user_id, key, new_bytes, quota, releases=releases):
+        return None
+    return jsonify({
+        "error": "Storage quota exceeded.",
+        "used_bytes": usage_index.used_bytes(user_id),
+        "quota_bytes": quota,
+        "requested_bytes": new_bytes
+    }), 413
+
+def ingest_estimate(source_bytes):
+    """
+    Bytes charged for a file until its ingest finishes: the original plus a
+    Parquet copy, assumed to be no larger.
+    """
+    return 2 * source_bytes
+
+def upload_charge_key(upload_id):
+    return f"upload-{upload_id}"
+
 # Health check route
 @app.route('/', methods=['GET'])
 def home():
@@ -368,11 +571,14 @@ def get_profile(current_user_id):
     except Exception as e:
         return jsonify({"error": f"Failed to get profile: {str(e)}"}), 500
 
-# Route for uploading files to Cloudinary
+# Route for uploading dataset files
 @app.route('/upload_file', methods=['POST'])
-def upload_file():
+@token_optional
+def upload_file(current_user_id):
     """
-    Uploads files to Cloudinary as raw resources and provides the public URL of the uploaded file.
+    Receives a dataset file and queues its ingest job, which converts and profiles it
+    and saves it to the configured storage backend. Returns the dataset_id and a
+    status URL to poll until the dataset is ready.
     """
     # Check if the file is present in the request
     if 'file' not in request.files:
@@ -383,84 +589,1309 @@ def upload_file():
     if csv_file.filename == '':
         return jsonify({"error": "No selected file."}), 400
 
+    # Uploads may be added to a workspace of the user's as a table named after the file
+    workspace_id = request.form.get('workspace_id')
+    error = workspace_id and workspace_access_error(workspace_id, current_user_id)
+    if error:
+        return error
+
     try:
-        # Upload the file to Cloudinary
-        upload_result = cloudinary.uploader.upload(
-            csv_file,
-            resource_type="raw",
-            public_id=csv_file.filename.split('.')[0]
-        )
-        # Return success message and file URL
-        return jsonify({"message": "File uploaded successfully!", "filePath": upload_result["secure_url"]}), 200
+        # Stream the upload to disk in fixed-size chunks, hashing it on the way,
+        # so the same file always maps to the same dataset_id
+        dataset_id, spooled_path = spool_source(csv_file.stream)
     except Exception as e:
-        # Handle errors during the upload process
-        return jsonify({"error": f"Error uploading to Cloudinary: {str(e)}"}), 500
+        # Handle errors while receiving the file
+        return jsonify({"error": f"Error receiving file: {str(e)}"}), 500
+
+    return accept_upload(dataset_id, spooled_path, csv_file.filename, workspace_id, current_user_id)
 
-def get_schema_info(df):
+def accept_upload(dataset_id, spooled_path, filename, workspace_id=None, owner=ANONYMOUS_USER, reserved_key=None):
     """
-    Extract comprehensive schema information from the DataFrame.
+    Turn a fully received file into a dataset owned by owner: reuse the dataset
+    of a known file, whether ready or still being ingested, otherwise queue its
+    ingest job. Uploads that would take the owner over their storage quota are
+    refused. reserved_key names a charge made for the file while it was sent,
+    which is replaced by the dataset's. Returns the JSON response.
     """
-    schema_info = {
-        "columns": [],
-        "total_rows": len(df),
-        "sample_data": df.head(3).to_dict('records')
+    # Uploads of one file are accepted one at a time, so a second upload never
+    # replaces the source under a running job and is always recorded as an owner
+    with dataset_store.lock(dataset_id):
+        status = ingest_jobs.read_status(dataset_id)
+        pending = status is not None and status["state"] in PENDING_STATES
+        metadata = None
+        if pending or is_dataset_ready(dataset_id):
+            metadata = dataset_store.read_metadata(dataset_id) or {"dataset_id": dataset_id}
+
+        # A known file only counts against the owner's quota the first time they
+        # upload it, at an estimate until its ingest has stored it
+        if metadata is None or owner not in metadata.get("owners", []):
+            new_bytes = (metadata or {}).get("stored_bytes")
+            if new_bytes is None:
+                new_bytes = ingest_estimate(os.path.getsize(spooled_path))
+            error = reserve_quota(owner, dataset_id, new_bytes, releases=reserved_key)
+            if error:
+                os.remove(spooled_path)
+                if reserved_key:
+                    usage_index.release(owner, reserved_key)
+                return error
+        elif reserved_key:
+            usage_index.release(owner, reserved_key)
+
+        duplicate = metadata is not None
+        if duplicate:
+            os.remove(spooled_path)
+            if owner not in metadata.setdefault("owners", []):
+                metadata["owners"].append(owner)
+                dataset_store.write_metadata(dataset_id, metadata)
+        else:
+            source_path = dataset_store.adopt_source(dataset_id, spooled_path)
+            metadata = {
+                "dataset_id": dataset_id,
+                "filename": filename,
+                "uploaded_at": datetime.utcnow().isoformat(),
+                "owners": [owner]
+            }
+            # Written now so later uploads of the file can add their owner while it is ingested
+            dataset_store.write_metadata(dataset_id, metadata)
+            # Conversion, profiling and storage run in the background
+            ingest_jobs.submit(dataset_id, run_ingest_job, source_path, dict(metadata))
+
+    workspace_fields = {}
+    if workspace_id:
+        table = workspace_store.add_table(workspace_id, dataset_id, filename=filename)
+        workspace_fields = {"workspace_id": workspace_id, "table_name": table["name"]}
+
+    if not duplicate:
+        # Return right away; clients poll the status URL until the dataset is ready
+        return jsonify({
+            "message": "File received, processing started.",
+            "dataset_id": dataset_id,
+            "statusUrl": f"/datasets/{dataset_id}/status",
+            **workspace_fields
+        }), 202
+
+    # A re-upload of a known file resolves to the existing dataset and everything
+    # already built for it: columnar copies, profile and cached tables
+    print(f"♻️ Duplicate upload of dataset {dataset_id[:12]}, reusing existing artifacts")
+    return jsonify({
+        "message": "File already uploaded, processing is still running." if pending else "File already uploaded.",
+        "dataset_id": dataset_id,
+        "statusUrl": f"/datasets/{dataset_id}/status",
+        "duplicate": True,
+        "memory_bytes": metadata.get("memory_bytes"),
+        **workspace_fields
+    }), 202 if pending else 200
+
+def run_ingest_job(report, source_path, metadata):
+    """
+    Background ingest of an uploaded file: load it into the dataset's DuckDB
+    and Parquet files, precompute its profile, then save the original
+    and the Parquet copy to the storage backend.
+    """
+    dataset_id = metadata["dataset_id"]
+    # Name stored files by content hash so files that share a name never overwrite each other
+    public_id = f"datasets/{dataset_id}"
+
+    report("converting", 0.1)
+    ingest_dataset(dataset_id, source_path, metadata)
+
+    report("profiling", 0.5)
+    get_dataset_profile(dataset_id)
+
+    report("storing", 0.7)
+    metadata["filePath"] = storage.put(source_path, public_id)
+    dataset_store.register_source(metadata["filePath"], dataset_id)
+
+    # Keep the Parquet copy next to the original
+    metadata["parquetPath"] = storage.put(dataset_store.parquet_path(dataset_id), f"{public_id}.parquet")
+    # What the dataset takes in the storage backend, counted against its owners' quotas
+    metadata["stored_bytes"] = os.path.getsize(source_path) + os.path.getsize(dataset_store.parquet_path(dataset_id))
+    save_metadata(dataset_id, metadata)
+
+def save_metadata(dataset_id, metadata):
+    """
+    Write the metadata an ingest job built, keeping the owners that uploads of
+    the same file added while it ran. Once stored_bytes is known, it replaces
+    the estimate every owner was charged.
+    """
+    with dataset_store.lock(dataset_id):
+        stored = dataset_store.read_metadata(dataset_id) or {}
+        owners = metadata.setdefault("owners", [])
+        owners += [owner for owner in stored.get("owners", []) if owner not in owners]
+        dataset_store.write_metadata(dataset_id, metadata)
+        if "stored_bytes" in metadata:
+            for owner in owners:
+                usage_index.charge(owner, dataset_id, metadata["stored_bytes"])
+
+def release_ingest_charges(dataset_id):
+    """
+    Release what the owners of a dataset whose ingest failed were charged for it.
+    """
+    metadata = dataset_store.read_metadata(dataset_id) or {}
+    for owner in metadata.get("owners", []):
+        usage_index.release(owner, dataset_id)
+
+def add_dataset_owner(dataset_id, owner):
+    """
+    Record another user who uploaded a dataset, so it counts against their quota.
+    """
+    with dataset_store.lock(dataset_id):
+        metadata = dataset_store.read_metadata(dataset_id)
+        if metadata is not None and owner not in metadata.setdefault("owners", []):
+            metadata["owners"].append(owner)
+            dataset_store.write_metadata(dataset_id, metadata)
+
+# Storage usage per user and per tier
+@app.route('/admin/storage', methods=['GET'])
+@admin_required
+def storage_usage():
+    """
+    Returns, for admins, the storage charged to each user against their quota,
+    uploads still being sent or ingested included, the datasets and local
+    bytes in each tier, and every dataset with its tier and last use.
+    """
+    usage = tiering.usage()
+    usage["users"] = {
+        user_id: {
+            "datasets": sum(1 for key in charges if not key.startswith("upload-")),
+            "uploads": sum(1 for key in charges if key.startswith("upload-")),
+            "used_bytes": sum(charges.values()),
+            "quota_bytes": user_quota(user_id)
+        }
+        for user_id, charges in usage_index.users().items()
     }
-    
-    for col in df.columns:
-        col_info = {
-            "name": col,
-            "type": str(df[col].dtype),
-            "non_null_count": df[col].count(),
-            "null_count": df[col].isnull().sum(),
-            "unique_values": df[col].nunique(),
+    usage["local_max_bytes"] = local_dataset_max_bytes
+    return jsonify(usage), 200
+
+# Run a tiering pass now instead of waiting for the next scheduled one
+@app.route('/admin/storage/tiering', methods=['POST'])
+@admin_required
+def run_tiering():
+    return jsonify({"moves": tiering.run()}), 200
+
+# Start a resumable chunked upload
+@app.route('/uploads', methods=['POST'])
+@token_optional
+def create_upload(current_user_id):
+    """
+    Opens an upload session for a large file. The body gives the filename and
+    total size in bytes, and optionally a chunk_size and a workspace_id.
+    Returns the upload_id and the chunk layout: clients PUT each numbered chunk,
+    in parallel if they like, then POST to the complete URL.
+    """
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename')
+    if not filename:
+        return jsonify({"error": "filename is required."}), 400
+
+    workspace_id = data.get('workspace_id')
+    error = workspace_id and workspace_access_error(workspace_id, current_user_id)
+    if error:
+        return error
+
+    try:
+        session = upload_sessions.create(
+            filename,
+            data.get('size'),
+            data.get('chunk_size', upload_chunk_size),
+            workspace_id=workspace_id,
+            owner=current_user_id
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # The file counts against the user's quota from now on, so uploads sent in
+    # parallel cannot exceed it, and uploads that cannot fit send no chunk
+    upload_id = session["upload_id"]
+    error = reserve_quota(current_user_id, upload_charge_key(upload_id), ingest_estimate(session["size"]))
+    if error:
+        upload_sessions.delete(upload_id)
+        return error
+    return jsonify({
+        **session,
+        "chunkUrl": f"/uploads/{upload_id}/chunks/{{index}}",
+        "completeUrl": f"/uploads/{upload_id}/complete"
+    }), 201
+
+# Report which chunks of an upload have arrived, so clients can resume
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    try:
+        session = upload_sessions.get(upload_id)
+        session["received"] = upload_sessions.received_chunks(upload_id)
+        session["missing"] = upload_sessions.missing_chunks(upload_id)
+    except KeyError:
+        return jsonify({"error": "Upload not found."}), 404
+    return jsonify(session), 200
+
+# Receive one chunk of an upload
+@app.route('/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def put_upload_chunk(upload_id, index):
+    """
+    Stores the raw request body as chunk number index. If an X-Chunk-SHA256
+    header is sent, the chunk is rejected unless its SHA-256 matches. Sending a
+    chunk again replaces it.
+    """
+    if request.content_length is not None and request.content_length > upload_max_chunk_size:
+        return jsonify({"error": f"Chunks may be at most {upload_max_chunk_size} bytes."}), 413
+
+    try:
+        chunk = upload_sessions.write_chunk(
+            upload_id,
+            index,
+            request.stream,
+            checksum=request.headers.get('X-Chunk-SHA256'),
+            read_size=ingest_chunk_size
+        )
+    except KeyError:
+        return jsonify({"error": "Upload not found."}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(chunk), 200
+
+# Assemble a chunked upload and start its ingest
+@app.route('/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    """
+    Joins the chunks of an upload into one file and hands it to the ingest
+    pipeline, exactly like a single-request upload. An optional sha256 in the
+    body is checked against the whole file. Responds 409 with the missing chunk
+    numbers if any have not arrived yet.
+    """
+    try:
+        session = upload_sessions.get(upload_id)
+        missing = upload_sessions.missing_chunks(upload_id)
+    except KeyError:
+        return jsonify({"error": "Upload not found."}), 404
+    if missing:
+        return jsonify({"error": "Upload is incomplete.", "missing": missing}), 409
+
+    data = request.get_json(silent=True) or {}
+    hasher = new_dataset_hasher()
+    spooled_path = dataset_store.incoming_path()
+    try:
+        upload_sessions.assemble(upload_id, spooled_path, hasher, read_size=ingest_chunk_size)
+    except Exception as e:
+        if os.path.exists(spooled_path):
+            os.remove(spooled_path)
+        return jsonify({"error": f"Error assembling upload: {str(e)}"}), 500
+
+    # The dataset_id is the SHA-256 of the whole file
+    dataset_id = hasher.hexdigest()
+    if data.get('sha256') and data['sha256'].lower() != dataset_id:
+        os.remove(spooled_path)
+        return jsonify({"error": "Checksum mismatch for the assembled file."}), 400
+
+    upload_sessions.delete(upload_id)
+    return accept_upload(
+        dataset_id,
+        spooled_path,
+        session["filename"],
+        session.get("workspace_id"),
+        session.get("owner", ANONYMOUS_USER),
+        reserved_key=upload_charge_key(upload_id)
+    )
+
+# Abandon a chunked upload and free its chunks
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def delete_upload(upload_id):
+    try:
+        session = upload_sessions.get(upload_id)
+    except KeyError:
+        return jsonify({"error": "Upload not found."}), 404
+    upload_sessions.delete(upload_id)
+    usage_index.release(session.get("owner", ANONYMOUS_USER), upload_charge_key(upload_id))
+    return jsonify({"message": "Upload deleted."}), 200
+
+# Report the progress of a dataset's background ingest job
+@app.route('/datasets/<dataset_id>/status', methods=['GET'])
+def dataset_status(dataset_id):
+    """
+    Returns the state, current stage and progress of a dataset's ingest job.
+    Once the dataset is ready, its file URLs and size are included.
+    """
+    try:
+        status = ingest_jobs.read_status(dataset_id)
+        metadata = dataset_store.read_metadata(dataset_id)
+    except KeyError:
+        return jsonify({"error": "Dataset not found."}), 404
+
+    if status is None:
+        if metadata is None:
+            return jsonify({"error": "Dataset not found."}), 404
+        # Datasets ingested from their filePath by locate_dataset, and those made
+        # by appends, have no ingest job
+        status = {"dataset_id": dataset_id, "state": "ready", "stage": "done", "progress": 1.0}
+
+    if status["state"] == "ready" and metadata:
+        for key in ("filename", "format", "filePath", "parquetPath", "total_rows", "total_columns", "memory_bytes", "partitioning"):
+            status[key] = metadata.get(key)
+        status["segments"] = len(metadata.get("segments", []))
+        status["version"] = metadata.get("version", status["segments"])
+        status["tier"] = tiering.tier(dataset_id)
+    return jsonify(status), 200
+
+# List the versions of a dataset
+@app.route('/datasets/<dataset_id>/versions', methods=['GET'])
+def dataset_versions(dataset_id):
+    """
+    Returns the manifest of every version of a dataset, oldest first, and the
+    current version number. Any version can be queried by passing it as
+    "version" to /generate_sql.
+    """
+    try:
+        metadata = dataset_store.read_metadata(dataset_id)
+    except KeyError:
+        metadata = None
+    if metadata is None:
+        return jsonify({"error": "Dataset not found."}), 404
+    status = pending_ingest_status(dataset_id)
+    if status:
+        return jsonify({"error": "Dataset is still being processed. Please try again shortly.", "status": status}), 409
+
+    try:
+        current = dataset_manifest(dataset_id)["version"]
+        versions = [dataset_manifest(dataset_id, version) for version in range(current + 1)]
+    except KeyError:
+        # Ingest failed before the dataset's first version was written
+        return jsonify({"error": "Dataset not found."}), 404
+    return jsonify({"dataset_id": dataset_id, "current_version": current, "versions": versions}), 200
+
+# Show the manifest of one dataset version
+@app.route('/datasets/<dataset_id>/versions/<int:version>', methods=['GET'])
+def dataset_version(dataset_id, version):
+    try:
+        metadata = dataset_store.read_metadata(dataset_id)
+    except KeyError:
+        metadata = None
+    if metadata is None:
+        return jsonify({"error": "Dataset not found."}), 404
+
+    try:
+        return jsonify(dataset_manifest(dataset_id, version)), 200
+    except KeyError:
+        return jsonify({"error": "Version not found."}), 404
+
+# Show the profile of a dataset version
+@app.route('/datasets/<dataset_id>/profile', methods=['GET'])
+def dataset_profile(dataset_id):
+    """
+    Returns the schema_info of a dataset version, the current one unless
+    "version" is given: row count, sample rows, and each column's type, counts,
+    range or sample values. Profiles are stored with the dataset, so this does
+    not download the data unless the version was never profiled on this host.
+    """
+    version = request.args.get('version', type=int)
+    try:
+        metadata = dataset_store.read_metadata(dataset_id)
+    except KeyError:
+        metadata = None
+    if metadata is None:
+        return jsonify({"error": "Dataset not found."}), 404
+    status = pending_ingest_status(dataset_id)
+    if status:
+        return jsonify({"error": "Dataset is still being processed. Please try again shortly.", "status": status}), 409
+
+    try:
+        manifest = dataset_manifest(dataset_id, version)
+        profile = get_dataset_profile(dataset_id, manifest["version"])
+    except KeyError:
+        return jsonify({"error": "Version not found."}), 404
+    return jsonify({"dataset_id": dataset_id, "version": manifest["version"], "profile": profile}), 200
+
+# Record another uploader of a dataset already stored
+@app.route('/datasets/<dataset_id>/owners', methods=['POST'])
+@token_optional
+def claim_dataset(current_user_id, dataset_id):
+    """
+    Adds the requesting user to the owners of a ready dataset, as uploading the
+    same file again would, so clients that find their file already stored can
+    skip the upload. The dataset then counts against the user's quota, and
+    claims that would exceed it are refused. Returns the dataset's status.
+    """
+    try:
+        metadata = dataset_store.read_metadata(dataset_id) if is_dataset_ready(dataset_id) else None
+    except KeyError:
+        metadata = None
+    if metadata is None:
+        return jsonify({"error": "Dataset not found."}), 404
+
+    if current_user_id not in metadata.get("owners", []):
+        error = reserve_quota(current_user_id, dataset_id, metadata.get("stored_bytes", 0))
+        if error:
+            return error
+        add_dataset_owner(dataset_id, current_user_id)
+    return dataset_status(dataset_id)
+
+# Append rows to a dataset, as a new dataset
+@app.route('/datasets/<dataset_id>/append', methods=['POST'])
+@token_optional
+def append_to_dataset(current_user_id, dataset_id):
+    """
+    Appends the rows of an uploaded file, in any supported format, to a dataset
+    the user owns. The result is a new dataset owned by the appender, whose
+    dataset_id is derived from the parent's and the new rows'; the parent is
+    left unchanged for its other owners and for uploads of the same file. Only
+    the new rows are read and profiled, and the parent's files are shared.
+    """
+    if 'file' not in request.files:
+        return jsonify({"error": "No file provided."}), 400
+
+    try:
+        if not is_dataset_ready(dataset_id) or not ensure_local_copy(dataset_id):
+            return jsonify({"error": "Dataset not found."}), 404
+    except KeyError:
+        return jsonify({"error": "Dataset not found."}), 404
+
+    # Datasets found through their filePath have no owners, so nobody may append to them
+    if current_user_id not in dataset_store.read_metadata(dataset_id).get("owners", []):
+        return jsonify({"error": "Only the dataset's owners may append to it."}), 403
+
+    try:
+        segment_id, spooled_path = spool_source(request.files['file'].stream)
+    except Exception as e:
+        return jsonify({"error": f"Error receiving file: {str(e)}"}), 500
+
+    # Charged before the append so appends made in parallel cannot exceed the quota
+    appended_id = derived_dataset_id(dataset_id, segment_id)
+    error = reserve_quota(current_user_id, appended_id, ingest_estimate(os.path.getsize(spooled_path)))
+    if error:
+        os.remove(spooled_path)
+        return error
+
+    metadata = None
+    try:
+        # The parent is locked so tiering cannot remove its files while they are linked
+        with dataset_store.lock(dataset_id), dataset_store.lock(appended_id):
+            metadata = dataset_store.read_metadata(appended_id)
+            # Retrying an append must not add the same rows twice
+            if metadata is not None:
+                if current_user_id not in metadata["owners"]:
+                    metadata["owners"].append(current_user_id)
+                    dataset_store.write_metadata(appended_id, metadata)
+                usage_index.charge(current_user_id, appended_id, metadata["stored_bytes"])
+                return jsonify({
+                    "message": "Rows already appended.",
+                    "dataset_id": appended_id,
+                    "parent_id": dataset_id,
+                    "segment_id": segment_id,
+                    "total_rows": metadata["total_rows"],
+                    "version": metadata["version"],
+                    "duplicate": True
+                }), 200
+            metadata = fork_with_segment(dataset_id, appended_id, segment_id, spooled_path, current_user_id)
+            usage_index.charge(current_user_id, appended_id, metadata["stored_bytes"])
+    except (ValueError, duckdb.Error) as e:
+        return jsonify({"error": f"Could not append rows: {str(e)}"}), 400
+    finally:
+        if os.path.exists(spooled_path):
+            os.remove(spooled_path)
+        if metadata is None:
+            usage_index.release(current_user_id, appended_id)
+
+    tiering.record_access(appended_id)
+    # Store the new version's profile now, so its first question does not wait for it
+    get_dataset_profile(appended_id)
+    rows = metadata["segments"][-1]["rows"]
+    print(f"➕ Appended {rows} rows to dataset {dataset_id[:12]} as dataset {appended_id[:12]}")
+    return jsonify({
+        "message": "Rows appended.",
+        "dataset_id": appended_id,
+        "parent_id": dataset_id,
+        "segment_id": segment_id,
+        "rows_appended": rows,
+        "total_rows": metadata["total_rows"],
+        "segments": len(metadata["segments"]),
+        "version": metadata["version"]
+    }), 201
+
+def fork_with_segment(parent_id, dataset_id, segment_id, source_path, owner):
+    """
+    Create dataset_id as parent_id plus the rows of source_path, written as
+    Parquet segment segment_id, and return its metadata. Its versions are the
+    parent's followed by one more; a failed append leaves nothing behind.
+    """
+    ensure_local_copy(parent_id)
+    parent = dataset_store.read_metadata(parent_id)
+    dataset_store.fork(parent_id, dataset_id)
+    try:
+        segment_path = dataset_store.segment_path(dataset_id, segment_id)
+        rows = ingest_segment(
+            source_path,
+            dataset_store.parquet_path(dataset_id),
+            segment_path,
+            column_types=parent.get("column_types"),
+            inferred_types=parent.get("inferred_types"),
+            date_formats=parent.get("date_formats")
+        )
+        # Profile the new rows alone; get_dataset_profile merges them into the parent's profile
+        dataset_store.write_segment_profile(dataset_id, segment_id, json_safe(profile_segment(dataset_id, segment_id)))
+
+        metadata = {
+            **parent,
+            "dataset_id": dataset_id,
+            "parent_id": parent_id,
+            "owners": [owner],
+            "appended_at": datetime.utcnow().isoformat(),
+            "segments": parent.get("segments", []) + [{
+                "segment_id": segment_id,
+                "rows": rows,
+                "appended_at": datetime.utcnow().isoformat(),
+                "parquetPath": storage.put(segment_path, f"datasets/{dataset_id}.{segment_id}.parquet")
+            }],
+            "total_rows": parent["total_rows"] + rows,
+            # The parent's files are shared and already count against the appender, an owner of the parent
+            "stored_bytes": os.path.getsize(segment_path)
         }
-        
-        # Add sample values for better context
-        if df[col].dtype in ['object', 'string']:
-            col_info["sample_values"] = df[col].dropna().unique()[:5].tolist()
-            col_info["data_category"] = "text/categorical"
-        elif df[col].dtype in ['int64', 'float64', 'int32', 'float32']:
-            col_info["min_value"] = df[col].min()
-            col_info["max_value"] = df[col].max()
-            col_info["mean_value"] = round(df[col].mean(), 2) if pd.notna(df[col].mean()) else None
-            col_info["data_category"] = "numeric"
-        elif df[col].dtype in ['datetime64[ns]', 'datetime']:
-            col_info["min_date"] = str(df[col].min())
-            col_info["max_date"] = str(df[col].max())
-            col_info["data_category"] = "datetime"
+        metadata["version"] = len(metadata["segments"])
+        for version in range(metadata["version"]):
+            dataset_store.write_manifest(dataset_id, {**dataset_manifest(parent_id, version), "dataset_id": dataset_id})
+        # Every manifest is in place before metadata makes the dataset exist
+        dataset_store.write_manifest(dataset_id, build_manifest(metadata))
+        dataset_store.write_metadata(dataset_id, metadata)
+    except Exception:
+        dataset_store.remove(dataset_id)
+        raise
+    return metadata
+
+# Create a workspace for querying several datasets together
+@app.route('/workspaces', methods=['POST'])
+@token_optional
+def create_workspace(current_user_id):
+    """
+    Creates a workspace owned by the user, optionally seeded with existing
+    datasets given as "dataset_ids". Files uploaded with its workspace_id are
+    added as tables.
+    """
+    data = request.get_json(silent=True) or {}
+    filenames = {}
+    for dataset_id in data.get('dataset_ids', []):
+        try:
+            metadata = dataset_store.read_metadata(dataset_id)
+        except KeyError:
+            metadata = None
+        if metadata is None:
+            return jsonify({"error": f"Dataset not found: {dataset_id}"}), 404
+        filenames[dataset_id] = metadata.get("filename")
+
+    workspace = workspace_store.create(current_user_id)
+    for dataset_id, filename in filenames.items():
+        workspace_store.add_table(workspace["workspace_id"], dataset_id, filename=filename)
+    return jsonify(describe_workspace(workspace["workspace_id"])), 201
+
+@app.route('/workspaces/<workspace_id>', methods=['GET'])
+def get_workspace(workspace_id):
+    """
+    Lists a workspace's tables with the dataset behind each one.
+    """
+    try:
+        return jsonify(describe_workspace(workspace_id)), 200
+    except KeyError:
+        return jsonify({"error": "Workspace not found."}), 404
+
+@app.route('/workspaces/<workspace_id>/tables', methods=['POST'])
+@token_optional
+def add_workspace_table(current_user_id, workspace_id):
+    """
+    Adds an uploaded dataset to the user's workspace, under "name" or a name derived from its file.
+    """
+    error = workspace_access_error(workspace_id, current_user_id)
+    if error:
+        return error
+    data = request.get_json(silent=True) or {}
+    dataset_id = data.get('dataset_id')
+    try:
+        metadata = dataset_store.read_metadata(dataset_id)
+    except KeyError:
+        metadata = None
+    if metadata is None:
+        return jsonify({"error": "Dataset not found."}), 404
+
+    try:
+        workspace_store.add_table(workspace_id, dataset_id, filename=metadata.get("filename"), name=data.get('name'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(describe_workspace(workspace_id)), 200
+
+@app.route('/workspaces/<workspace_id>/tables/<name>', methods=['DELETE'])
+@token_optional
+def remove_workspace_table(current_user_id, workspace_id, name):
+    """
+    Removes a table from the user's workspace. The dataset itself is kept.
+    """
+    error = workspace_access_error(workspace_id, current_user_id)
+    if error:
+        return error
+    try:
+        workspace_store.remove_table(workspace_id, name)
+        return jsonify(describe_workspace(workspace_id)), 200
+    except KeyError:
+        return jsonify({"error": "Table not found."}), 404
+
+def workspace_access_error(workspace_id, user_id):
+    """
+    The error response if the workspace does not exist or belongs to someone
+    other than user_id, who may then not change its tables, or None.
+    """
+    try:
+        workspace = workspace_store.get(workspace_id)
+    except KeyError:
+        return jsonify({"error": "Workspace not found."}), 404
+    if workspace.get("owner") != user_id:
+        return jsonify({"error": "Only the workspace's owner may change it."}), 403
+    return None
+
+def describe_workspace(workspace_id):
+    """
+    A workspace with the file name, row count and ingest state of each table.
+    """
+    workspace = workspace_store.get(workspace_id)
+    for table in workspace["tables"]:
+        metadata = dataset_store.read_metadata(table["dataset_id"]) or {}
+        table["filename"] = metadata.get("filename")
+        table["total_rows"] = metadata.get("total_rows")
+        table["ready"] = is_dataset_ready(table["dataset_id"])
+    return workspace
+
+def is_remote_source(file_path):
+    return file_path.startswith(("http://", "https://"))
+
+def open_source(file_path):
+    """
+    Open a dataset from a URL, or from the storage backend, as a binary stream.
+    Local paths outside the storage backend raise KeyError.
+    """
+    if is_remote_source(file_path):
+        return urllib.request.urlopen(file_path)
+    return storage.open(file_path)
+
+def spool_source(stream):
+    """
+    Stream a file to the incoming area chunk by chunk and return
+    (dataset_id, spooled_path). Memory use is bounded by INGEST_CHUNK_SIZE.
+    """
+    hasher = new_dataset_hasher()
+    spooled_path = dataset_store.incoming_path()
+    try:
+        spool_stream(stream, spooled_path, ingest_chunk_size, hasher)
+    except Exception:
+        if os.path.exists(spooled_path):
+            os.remove(spooled_path)
+        raise
+    return hasher.hexdigest(), spooled_path
+
+def ingest_dataset(dataset_id, source_path, metadata):
+    """
+    Load an uploaded CSV, NDJSON, Parquet or XLSX file with DuckDB into the
+    dataset's database and Parquet copy, with column types narrowed at ingest,
+    and record its metadata.
+    """
+    summary = ingest_file(
+        source_path,
+        dataset_store.parquet_path(dataset_id),
+        dataset_store.duckdb_path(dataset_id),
+        threads=duckdb_threads,
+        memory_limit=ingest_memory_limit,
+        partitions_dir=dataset_store.partitions_dir(dataset_id),
+        partition_min_rows=partition_min_rows
+    )
+    # The chosen column types are kept so other hosts rebuild the dataset with them
+    metadata.update(summary)
+    # The uploaded file is version 0; every append adds a version
+    metadata["version"] = 0
+    dataset_store.write_manifest(dataset_id, build_manifest(metadata))
+    save_metadata(dataset_id, metadata)
+
+def locate_dataset(dataset_id=None, file_path=None):
+    """
+    Resolve a request's dataset_id or legacy filePath to a dataset this host can
+    query, fetching or ingesting it if needed. Raises KeyError if it cannot be located.
+    """
+    remote_entry = None
+    if not dataset_id and file_path:
+        if is_remote_source(file_path):
+            # Revalidate the cached copy; an unchanged file costs a single 304
+            remote_entry = remote_cache.fetch(file_path)
+            dataset_id = remote_entry["content_hash"]
         else:
-            col_info["data_category"] = "other"
-            
-        schema_info["columns"].append(col_info)
-    
+            dataset_id = dataset_store.dataset_for_source(file_path)
+
+    if dataset_id:
+        if ensure_local_copy(dataset_id):
+            tiering.record_access(dataset_id)
+            return dataset_id
+        metadata = dataset_store.read_metadata(dataset_id) or {}
+        file_path = metadata.get("filePath") or file_path
+
+    if not file_path:
+        raise KeyError(f"Unknown dataset_id: {dataset_id}")
+
+    if is_remote_source(file_path):
+        # Copy out of the remote cache instead of downloading the file again
+        if remote_entry is None or remote_entry["url"] != file_path:
+            remote_entry = remote_cache.fetch(file_path)
+        with open(remote_entry["path"], "rb") as stream:
+            _, spooled_path = spool_source(stream)
+        content_id = remote_entry["content_hash"]
+    else:
+        with open_source(file_path) as stream:
+            content_id, spooled_path = spool_source(stream)
+    if dataset_id and dataset_id != content_id:
+        print(f"⚠️ Content behind {file_path} no longer matches dataset {dataset_id[:12]}")
+    dataset_store.register_source(file_path, content_id)
+
+    if ensure_local_copy(content_id):
+        os.remove(spooled_path)
+    else:
+        metadata = {"dataset_id": content_id, "filePath": file_path, "uploaded_at": datetime.utcnow().isoformat()}
+        ingest_dataset(content_id, dataset_store.adopt_source(content_id, spooled_path), metadata)
+    tiering.record_access(content_id)
+    return content_id
+
+def build_manifest(metadata):
+    """
+    Manifest of a dataset's current version: the segments appended up to it,
+    oldest first, the table's schema and its size.
+    """
+    return {
+        "dataset_id": metadata["dataset_id"],
+        "version": metadata["version"],
+        "created_at": datetime.utcnow().isoformat(),
+        "segments": metadata.get("segments", []),
+        "column_types": metadata.get("column_types"),
+        "partitioning": metadata.get("partitioning"),
+        "total_rows": metadata.get("total_rows"),
+        "total_columns": metadata.get("total_columns")
+    }
+
+def dataset_manifest(dataset_id, version=None):
+    """
+    The immutable manifest of a dataset version, the current one by default.
+
+    Version 0 is the uploaded file, and a dataset made by an append has its
+    parent's versions plus one, so version n is the upload plus its first n
+    segments. Raises KeyError for unknown versions, and for datasets whose
+    ingest has not written a manifest yet.
+    """
+    metadata = dataset_store.read_metadata(dataset_id) or {"dataset_id": dataset_id}
+    segments = metadata.get("segments", [])
+    current = metadata.get("version", len(segments))
+    if version is None:
+        version = current
+    if not 0 <= version <= current:
+        raise KeyError(f"Unknown version {version} of dataset {dataset_id}")
+    manifest = dataset_store.read_manifest(dataset_id, version)
+    if manifest is None:
+        raise KeyError(f"Dataset {dataset_id} has no manifest for version {version}")
+    return manifest
+
+def dataset_partitioning(dataset_id):
+    """
+    How a dataset's partitioned copy is split, {"column", "granularity",
+    "partitions"}, or None when it has no partitioned copy on this host.
+    """
+    partitioning = (dataset_store.read_metadata(dataset_id) or {}).get("partitioning")
+    if partitioning and dataset_store.has_partitions(dataset_id):
+        return partitioning
+    return None
+
+def is_dataset_ready(dataset_id):
+    """
+    True if the dataset has been fully ingested and stored, on this host or another.
+    """
+    status = ingest_jobs.read_status(dataset_id)
+    if status is not None:
+        return status["state"] == "ready"
+    metadata = dataset_store.read_metadata(dataset_id)
+    return bool(metadata and metadata.get("filePath"))
+
+def is_dataset_local(dataset_id):
+    """
+    True once this host holds the dataset's Parquet copy and DuckDB database.
+    """
+    try:
+        return dataset_store.has_parquet(dataset_id) and dataset_store.has_duckdb(dataset_id)
+    except KeyError:
+        return False
+
+def ensure_local_copy(dataset_id):
+    """
+    Make sure this host has the dataset's Parquet copy, appended segments and
+    DuckDB database, downloading the Parquet files from storage if needed.
+    This is also how datasets moved to the warm or cold tier come back.
+    Returns False when the dataset has no columnar copy anywhere.
+    """
+    if not dataset_store.has_parquet(dataset_id):
+        metadata = dataset_store.read_metadata(dataset_id) or {}
+        if not metadata.get("parquetPath"):
+            return False
+        download_stored_file(metadata["parquetPath"], dataset_store.parquet_path(dataset_id))
+
+    for segment in (dataset_store.read_metadata(dataset_id) or {}).get("segments", []):
+        if not dataset_store.has_segment(dataset_id, segment["segment_id"]):
+            download_stored_file(segment["parquetPath"], dataset_store.segment_path(dataset_id, segment["segment_id"]))
+
+    metadata = dataset_store.read_metadata(dataset_id) or {}
+    if not dataset_store.has_duckdb(dataset_id):
+        build_duckdb_file(
+            dataset_store.parquet_path(dataset_id),
+            dataset_store.duckdb_path(dataset_id),
+            column_types=metadata.get("column_types")
+        )
+    if metadata.get("partitioning") and not dataset_store.has_partitions(dataset_id):
+        build_partitions(
+            dataset_store.parquet_path(dataset_id),
+            dataset_store.partitions_dir(dataset_id),
+            metadata["partitioning"]
+        )
+    return True
+
+def download_stored_file(location, path):
+    """
+    Copy a file from the storage backend to path, under a temporary name that
+    is removed if the download fails.
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open_source(location) as stream:
+            spool_stream(stream, tmp_path, ingest_chunk_size)
+        os.replace(tmp_path, path)
+    except Exception:
+        remove_files(tmp_path)
+        raise
+
+def duckdb_config():
+    """
+    Connection settings shared by every query connection in this worker. DuckDB
+    requires all connections to one file in a process to use the same settings.
+    """
+    config = {}
+    if duckdb_memory_limit:
+        config["memory_limit"] = duckdb_memory_limit
+    if duckdb_threads:
+        config["threads"] = duckdb_threads
+    return config
+
+def open_dataset_connection(dataset_id, version=None):
+    """
+    Open the dataset's DuckDB database read-only. Many requests and workers can
+    hold it open at once, sharing its pages through the OS page cache, and
+    DuckDB reads only the blocks a query needs. For
+    partitioned datasets, and for rows appended since upload, uploaded_csv is a
+    view over the partition and segment files instead, as of the given version
+    or the current one.
+    """
+    if not dataset_store.has_duckdb(dataset_id) and not ensure_local_copy(dataset_id):
+        raise KeyError(f"No database for dataset_id: {dataset_id}")
+
+    conn = duckdb.connect(dataset_store.duckdb_path(dataset_id), read_only=True, config=duckdb_config())
+    if dataset_manifest(dataset_id, version)["segments"] or dataset_partitioning(dataset_id):
+        # The temporary view shadows the stored table for this connection only
+        try:
+            database = conn.execute("SELECT current_database()").fetchone()[0]
+            conn.execute(f"CREATE TEMP VIEW uploaded_csv AS {dataset_relation_sql(dataset_id, database, version)}")
+        except Exception:
+            conn.close()
+            raise
+    return conn
+
+def dataset_relation_sql(dataset_id, database, version=None):
+    """
+    SELECT over a dataset's stored table in the given attached database, or over
+    its partitioned copy when it has one, plus the rows appended up to the given
+    version, read from their Parquet segment files.
+    """
+    if dataset_partitioning(dataset_id):
+        sql = f"SELECT * FROM {partitions_relation_sql(dataset_store.partitions_dir(dataset_id))}"
+    else:
+        sql = f"SELECT * FROM {sql_identifier(database)}.main.uploaded_csv"
+    segments = dataset_manifest(dataset_id, version)["segments"]
+    if segments:
+        segment_paths = ", ".join(sql_string(dataset_store.segment_path(dataset_id, s["segment_id"])) for s in segments)
+        sql += f" UNION ALL BY NAME SELECT * FROM read_parquet([{segment_paths}])"
+    return sql
+
+def open_workspace_connection(table_datasets, table_versions=None):
+    """
+    Open one DuckDB connection over several datasets, given as {table name: dataset_id}.
+
+    Each dataset's database file is attached read-only and exposed under its
+    table name, so queries can join across the files without loading any of them.
+    table_versions pins tables to versions, {table name: version}; other tables
+    are read at their current version.
+    """
+    table_versions = table_versions or {}
+    conn = duckdb.connect(config=duckdb_config())
+    try:
+        for i, (table_name, dataset_id) in enumerate(table_datasets.items()):
+            if not dataset_store.has_duckdb(dataset_id) and not ensure_local_copy(dataset_id):
+                raise KeyError(f"No database for dataset_id: {dataset_id}")
+            database = f"dataset_{i}"
+            conn.execute(f"ATTACH {sql_string(dataset_store.duckdb_path(dataset_id))} AS {database} (READ_ONLY)")
+            relation_sql = dataset_relation_sql(dataset_id, database, table_versions.get(table_name))
+            conn.execute(f"CREATE TEMP VIEW {sql_identifier(table_name)} AS {relation_sql}")
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+def pending_ingest_status(dataset_id):
+    """
+    The ingest status of a dataset that cannot be queried yet because its job is
+    still queued or running, or None if it can be queried.
+    """
+    if not dataset_id or is_dataset_local(dataset_id):
+        return None
+    try:
+        status = ingest_jobs.read_status(dataset_id)
+    except KeyError:
+        return None
+    if status and status["state"] in PENDING_STATES:
+        return status
+    return None
+
+def describe_source_dataset(dataset_id, file_path=None):
+    """
+    Short description of the full uploaded dataset for analysis/chat prompts.
+    Returns an empty string when the dataset is not available.
+    """
+    if not dataset_id:
+        return ""
+    try:
+        # Row count and column names come from the cached profile, not the table
+        schema_info = get_dataset_profile(locate_dataset(dataset_id, file_path))
+    except Exception as e:
+        print(f"⚠️ Could not load source dataset {dataset_id[:12]}: {str(e)}")
+        return ""
+
+    columns = [str(col['name']) for col in schema_info['columns']]
+    context = "Source Dataset (full uploaded file):\n"
+    context += f"- Total Rows: {schema_info['total_rows']}\n"
+    context += f"- Columns ({len(columns)}): {', '.join(columns)}\n\n"
+    return context
+
+def get_dataset_profile(dataset_id, version=None):
+    """
+    Return the schema_info of a dataset version, the current one by default,
+    merging stored segment profiles into the last profiled version when needed.
+    """
+    if version is not None:
+        schema_info = cached_profile(dataset_id, version)
+        if schema_info is not None:
+            return schema_info
+    manifest = dataset_manifest(dataset_id, version)
+    version = manifest["version"]
+    schema_info = cached_profile(dataset_id, version)
+    if schema_info is not None:
+        return schema_info
+
+    start = version
+    while True:
+        schema_info = cached_profile(dataset_id, start) or dataset_store.read_profile(dataset_id, start)
+        if schema_info is not None or start == 0:
+            break
+        start -= 1
+    if schema_info is None:
+        schema_info = json_safe(profile_base_table(dataset_id))
+        dataset_store.write_profile(dataset_id, 0, schema_info)
+        if schema_info.get("sampled_rows"):
+            profile_jobs.submit(dataset_id, refine_dataset_profile, dataset_id)
+    # Version n holds the uploaded rows and the first n segments
+    if start < version:
+        for segment in manifest["segments"][start:version]:
+            segment_info = dataset_store.read_segment_profile(dataset_id, segment["segment_id"])
+            if segment_info is not None:
+                schema_info = merge_schema_info(schema_info, segment_info)
+        sketches = version_sketches(dataset_id, version, manifest["segments"])
+        for col in schema_info["columns"] if sketches else []:
+            if col["name"] in sketches:
+                # The merged upper bound still caps the estimate
+                col["unique_values"] = min(sketches[col["name"]].estimate(), col["unique_values"])
+        dataset_store.write_profile(dataset_id, version, schema_info)
+    profile_cache.put(dataset_id, version, schema_info)
+    return schema_info
+
+def cached_profile(dataset_id, version):
+    """
+    The schema_info of a dataset version held in this worker's memory, or None.
+    Profiles estimated from a sample are not served from memory, since another
+    worker may have replaced the stored profile with an exact one since.
+    """
+    schema_info = profile_cache.get(dataset_id, version)
+    if schema_info is not None and schema_info.get("sampled_rows"):
+        return None
+    return schema_info
+
+def refine_dataset_profile(dataset_id):
+    """
+    Replace the sampled profile of a dataset's uploaded rows with an exact one.
+    Profiles of later versions were merged from the sampled one, so they are
+    removed and rebuilt from the exact profile the next time they are used.
+    """
+    schema_info = json_safe(profile_base_table(dataset_id, exact=True))
+    with dataset_store.lock(dataset_id):
+        dataset_store.write_profile(dataset_id, 0, schema_info)
+        dataset_store.delete_profiles(dataset_id, 1)
+    profile_cache.evict_dataset(dataset_id)
+    print(f"📐 Exact profile ready for dataset {dataset_id[:12]}")
+
+def version_sketches(dataset_id, version, segments):
+    """
+    HyperLogLog sketches of every column of a dataset version, or None if some
+    of its rows were profiled without them. They are merged from the sketches
+    of the newest earlier version that has them and of the segments appended
+    since, and stored for the next version to start from.
+    """
+    start = version
+    while True:
+        sketches = decode_sketches(dataset_store.read_sketches(dataset_id, f"version-{start}"))
+        if sketches is not None:
+            break
+        if start == 0:
+            return None
+        start -= 1
+    if start < version:
+        for segment in segments[start:version]:
+            segment_sketches = decode_sketches(dataset_store.read_sketches(dataset_id, segment["segment_id"]))
+            if segment_sketches is None:
+                return None
+            for name, sketch in segment_sketches.items():
+                sketches[name] = sketches[name].merge(sketch) if name in sketches else sketch
+        dataset_store.write_sketches(dataset_id, f"version-{version}", encode_sketches(sketches))
+    return sketches
+
+def json_safe(value):
+    """
+    Convert a schema_info structure to plain JSON types, so numbers read back from
+    a stored profile are numbers again rather than strings.
+    """
+    if isinstance(value, dict):
+        return {str(k): json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [json_safe(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return None if np.isnan(value) else value
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    return str(value)
+
+def merge_schema_info(schema_info, segment_info):
+    """
+    Combine a dataset's schema_info with that of an appended segment without
+    rescanning either; distinct counts become an estimated upper bound.
+    """
+    def pick(a, b, fn):
+        values = [v for v in (a, b) if v is not None and str(v) not in ("nan", "NaT", "<NA>", "None")]
+        return fn(values) if values else None
+
+    segment_columns = {col["name"]: col for col in segment_info["columns"]}
+    merged = {
+        "columns": [],
+        "total_rows": schema_info["total_rows"] + segment_info["total_rows"],
+        "sample_data": schema_info["sample_data"] or segment_info["sample_data"]
+    }
+    if schema_info.get("sampled_rows"):
+        merged["sampled_rows"] = schema_info["sampled_rows"]
+    for col in schema_info["columns"]:
+        col = dict(col)
+        segment_col = segment_columns.get(col["name"])
+        if segment_col is not None:
+            base_non_null = col["non_null_count"]
+            col["non_null_count"] = base_non_null + segment_col["non_null_count"]
+            col["null_count"] = col["null_count"] + segment_col["null_count"]
+            col["unique_values"] = min(col["unique_values"] + segment_col["unique_values"], col["non_null_count"])
+            mark_estimated(col, "unique_values", *segment_col.get("estimated", []))
+            if "sample_values" in col and "sample_values" in segment_col:
+                samples = list(col["sample_values"])
+                samples += [v for v in segment_col["sample_values"] if v not in samples]
+                col["sample_values"] = samples[:5]
+            if "min_value" in col and "min_value" in segment_col:
+                col["min_value"] = pick(col["min_value"], segment_col["min_value"], min)
+                col["max_value"] = pick(col["max_value"], segment_col["max_value"], max)
+                if col["mean_value"] is None or segment_col["mean_value"] is None:
+                    col["mean_value"] = pick(col["mean_value"], segment_col["mean_value"], lambda values: values[0])
+                elif col["non_null_count"]:
+                    col["mean_value"] = round(
+                        (col["mean_value"] * base_non_null + segment_col["mean_value"] * segment_col["non_null_count"])
+                        / col["non_null_count"], 2
+                    )
+            if "min_date" in col and "min_date" in segment_col:
+                col["min_date"] = pick(col["min_date"], segment_col["min_date"], min)
+                col["max_date"] = pick(col["max_date"], segment_col["max_date"], max)
+        merged["columns"].append(col)
+    return merged
+
+def profile_base_table(dataset_id, exact=False):
+    """
+    schema_info of a dataset's uploaded rows, profiled straight from its DuckDB
+    database in one scan. The stored table never holds appended rows. The
+    columns' sketches are stored as those of version 0. Wide tables have their
+    columns split across PROFILE_WORKERS processes.
+
+    Unless exact, the profile keeps to the row and time budgets: larger tables
+    are profiled from a sample, and a profile running over the time budget is
+    interrupted and redone from a sample of a tenth of the rows.
+    """
+    db_path = dataset_store.duckdb_path(locate_dataset(dataset_id))
+    options = {
+        "workers": profile_workers,
+        "pool_idle_seconds": profile_pool_idle_seconds,
+        "config": duckdb_config(),
+        "exact_distinct": profile_distinct_counts == "exact"
+    }
+    sketches = {}
+    try:
+        schema_info = profile_database_table(
+            db_path, "main.uploaded_csv", sketches=sketches,
+            sample_rows=None if exact else profile_row_budget or None,
+            time_budget=None if exact else profile_time_budget or None,
+            **options
+        )
+    except duckdb.InterruptException:
+        with duckdb.connect(db_path, read_only=True, config=duckdb_config()) as conn:
+            total_rows = conn.execute("SELECT COUNT(*) FROM main.uploaded_csv").fetchone()[0]
+        sample_rows = max(min(total_rows, profile_row_budget or total_rows) // 10, 1)
+        print(f"⏱️ Profiling dataset {dataset_id[:12]} exceeded {profile_time_budget}s, sampling {sample_rows} rows")
+        sketches = {}
+        schema_info = profile_database_table(db_path, "main.uploaded_csv", sample_rows=sample_rows, **options)
+    # A sampled profile has no sketches; those of version 0 must cover every row
+    if sketches:
+        dataset_store.write_sketches(dataset_id, "version-0", encode_sketches(sketches))
+    return schema_info
+
+def profile_segment(dataset_id, segment_id):
+    """
+    schema_info of an appended segment alone, storing its columns' sketches.
+    """
+    conn = duckdb.connect(config=duckdb_config())
+    sketches = {}
+    try:
+        schema_info = profile_relation(
+            conn,
+            f"read_parquet({sql_string(dataset_store.segment_path(dataset_id, segment_id))})",
+            exact_distinct=profile_distinct_counts == "exact",
+            sketches=sketches
+        )
+    finally:
+        conn.close()
+    dataset_store.write_sketches(dataset_id, segment_id, encode_sketches(sketches))
     return schema_info
 
-def create_optimized_prompt(text_input, schema_info):
+def find_join_keys(tables):
+    """
+    Guess how the tables of a workspace relate, from their schema_info alone.
+
+    Columns are paired when they have the same name, or when one is named after
+    the other table (customer_id -> customers.id), and both have the same data
+    category. Same-named columns must also look like a key: named *_id, *_key or
+    *_code, or holding only distinct values. Returns "a.x = b.y" descriptions.
+    """
+    def is_key_like(col, schema_info):
+        return (
+            re.search(r"(^|_)(id|key|code)$", col['name'].lower()) is not None
+            or re.search(r"[a-z]Id$", col['name']) is not None
+            or col['unique_values'] == col['non_null_count'] == schema_info['total_rows']
+        )
+
+    def refers_to(col, table_name):
+        names = {table_name, table_name[:-1] if table_name.endswith("s") else table_name}
+        return col['name'].lower() in {f"{name}_id" for name in names} | {f"{name}id" for name in names}
+
+    join_keys = []
+    for (left, left_info), (right, right_info) in itertools.combinations(tables.items(), 2):
+        for left_col in left_info['columns']:
+            for right_col in right_info['columns']:
+                if left_col['data_category'] != right_col['data_category'] or left_col['data_category'] == 'other':
+                    continue
+                same_name = left_col['name'].lower() == right_col['name'].lower() and (
+                    is_key_like(left_col, left_info) or is_key_like(right_col, right_info)
+                )
+                foreign_key = (
+                    (refers_to(left_col, right) and right_col['name'].lower() == 'id')
+                    or (refers_to(right_col, left) and left_col['name'].lower() == 'id')
+                )
+                if same_name or foreign_key:
+                    join_keys.append(f"{left}.{left_col['name']} = {right}.{right_col['name']}")
+    return join_keys
+
+def create_optimized_prompt(text_input, tables, join_keys=None, partitioning=None):
     """
     Create an optimized prompt for SQL query generation with comprehensive schema information.
+    tables maps each table name to its schema_info; workspaces pass several
+    tables together with the join keys found between them. partitioning maps
+    the names of partitioned tables to how they are split, so the model writes
+    filters that let DuckDB skip partitions.
     """
+    partitioning = partitioning or {}
     # Format schema information
-    schema_text = "TABLE SCHEMA:\n"
-    schema_text += f"Table Name: uploaded_csv\n"
-    schema_text += f"Total Rows: {schema_info['total_rows']}\n\n"
-    
-    schema_text += "COLUMNS:\n"
-    for col in schema_info['columns']:
-        schema_text += f"- {col['name']} ({col['type']}, {col['data_category']})\n"
-        schema_text += f"  Non-null: {col['non_null_count']}, Unique values: {col['unique_values']}\n"
-        
-        if col['data_category'] == 'text/categorical' and 'sample_values' in col:
-            schema_text += f"  Sample values: {col['sample_values']}\n"
-        elif col['data_category'] == 'numeric' and 'min_value' in col:
-            schema_text += f"  Range: {col['min_value']} to {col['max_value']}, Average: {col['mean_value']}\n"
-        elif col['data_category'] == 'datetime' and 'min_date' in col:
-            schema_text += f"  Date range: {col['min_date']} to {col['max_date']}\n"
+    schema_text = ""
+    for table_name, schema_info in tables.items():
+        schema_text += "TABLE SCHEMA:\n"
+        schema_text += f"Table Name: {table_name}\n"
+        schema_text += f"Total Rows: {schema_info['total_rows']}\n"
+        if table_name in partitioning:
+            split = partitioning[table_name]
+            unit = "month of" if split["granularity"] == "month" else "value of"
+            schema_text += f"Partitioned by: {unit} {split['column']} ({split['partitions']} partitions)\n"
         schema_text += "\n"
-    
-    # Sample data
-    schema_text += "SAMPLE DATA (first 3 rows):\n"
-    for i, row in enumerate(schema_info['sample_data'], 1):
-        schema_text += f"Row {i}: {row}\n"
+
+        schema_text += "COLUMNS:\n"
+        # Estimated figures are shown as ~N (estimated), or as ~N under a note when the whole profile is sampled
+        if schema_info.get('sampled_rows'):
+            schema_text += f"(Figures marked ~ are estimated from a sample of {schema_info['sampled_rows']} rows)\n"
+            estimated = "~{}"
+        else:
+            estimated = "~{} (estimated)"
+        for col in schema_info['columns']:
+            figure = {key: estimated.format(value) if key in col.get('estimated', []) else value for key, value in col.items()}
+            schema_text += f"- {col['name']} ({col['type']}, {col['data_category']})\n"
+            schema_text += f"  Non-null: {figure['non_null_count']}, Unique values: {figure['unique_values']}\n"
+
+            if col['data_category'] == 'text/categorical' and 'sample_values' in col:
+                schema_text += f"  Sample values: {col['sample_values']}\n"
+            elif col['data_category'] == 'numeric' and 'min_value' in col:
+                schema_text += f"  Range: {figure['min_value']} to {figure['max_value']}, Average: {figure['mean_value']}\n"
+            elif col['data_category'] == 'datetime' and 'min_date' in col:
+                schema_text += f"  Date range: {figure['min_date']} to {figure['max_date']}\n"
+            schema_text += "\n"
+
+        # Sample data
+        if schema_info.get('sampled_rows'):
+            schema_text += "SAMPLE DATA (3 sampled rows):\n"
+        else:
+            schema_text += "SAMPLE DATA (first 3 rows):\n"
+        for i, row in enumerate(schema_info['sample_data'], 1):
+            schema_text += f"Row {i}: {row}\n"
+        schema_text += "\n"
+
+    if join_keys:
+        schema_text += "LIKELY JOIN KEYS:\n"
+        for join_key in join_keys:
+            schema_text += f"- {join_key}\n"
+
+    if len(tables) == 1:
+        table_instruction = f"Use table name: {next(iter(tables))}"
+    else:
+        table_instruction = f"Use only these table names: {', '.join(tables)}; join them on the likely join keys when the request spans tables"
+
+    partition_instruction = ""
+    if partitioning:
+        examples = []
+        for split in partitioning.values():
+            col = f'"{split["column"]}"'
+            if split["granularity"] == "month":
+                examples.append(f"{col} >= DATE '2024-03-01' AND {col} < DATE '2024-04-01'")
+            else:
+                examples.append(f"{col} = 'value' or {col} IN (...)")
+        partition_instruction = (
+            "\n11. Partitioned tables only read the partitions selected by a WHERE clause on the partition column: "
+            f"compare the column itself to constants, e.g. {'; '.join(examples)}, "
+            "and never wrap it in functions such as strftime(), EXTRACT() or CAST() inside the filter"
+        )
     
     # Create the optimized prompt
     prompt = f"""You are a SQL expert specializing in DuckDB queries. Generate a precise SQL query based on the user request and schema information.
@@ -471,7 +1902,7 @@ USER REQUEST: "{text_input}"
 
 INSTRUCTIONS:
 1. Generate ONLY a valid DuckDB SQL query - no explanations, comments, or additional text
-2. Use table name: uploaded_csv
+2. {table_instruction}
 3. Keep column names EXACTLY as shown in schema (preserve spaces, case, special characters)
 4. Use double quotes around column names if they contain spaces or special characters
 5. When user requests aggregations (sum, count, average, max, min, group by), include appropriate aggregate functions
@@ -479,7 +1910,7 @@ INSTRUCTIONS:
 7. For date/time operations, use DuckDB date functions if needed
 8. For text searches, use LIKE or ILIKE for case-insensitive matching
 9. When joining or grouping, consider the data relationships shown in sample data
-10. Optimize for performance with appropriate LIMIT clauses if displaying sample results
+10. Optimize for performance with appropriate LIMIT clauses if displaying sample results{partition_instruction}
 
 COMMON AGGREGATION PATTERNS:
 - "total", "sum" → SUM()
@@ -498,7 +1929,7 @@ QUERY ONLY (no other text):"""
 @app.route('/generate_sql', methods=['POST'])
 def generate_sql():
     """
-   Generates an SQL query from user input and the structure of the uploaded CSV file, 
+   Generates an SQL query from user input and the structure of the uploaded dataset, 
    executes it with DuckDB, and returns the result as a downloadable CSV.
     """
     # Configure the Generative AI model with the provided API key
@@ -512,25 +1943,76 @@ def generate_sql():
 
     text_input = data['text']
 
-    # Validate if the file path is included in the request
-    if not data or 'filePath' not in data:
+    # Validate that the request identifies an uploaded dataset or a workspace
+    dataset_id = data.get('dataset_id')
+    filePath = data.get('filePath')
+    workspace_id = data.get('workspace_id')
+    if not dataset_id and not filePath and not workspace_id:
         return jsonify({"error": "No file uploaded. Please upload a file first."}), 400
 
-    filePath = data['filePath']
+    # Older versions of a dataset stay queryable; workspaces always read the current ones
+    version = data.get('version')
+    if version is not None and (workspace_id or not isinstance(version, int) or isinstance(version, bool)):
+        return jsonify({"error": "version must be an integer and is only supported for a single dataset."}), 400
 
+    # A workspace queries all of its tables together; a single dataset is uploaded_csv
+    if workspace_id:
+        try:
+            workspace = workspace_store.get(workspace_id)
+        except KeyError:
+            return jsonify({"error": "Workspace not found."}), 404
+        if not workspace["tables"]:
+            return jsonify({"error": "Workspace has no tables. Please upload a file first."}), 400
+        table_sources = [(table["name"], table["dataset_id"], None) for table in workspace["tables"]]
+    else:
+        table_sources = [("uploaded_csv", dataset_id, filePath)]
+
+    # Datasets still being ingested in the background cannot be queried yet
+    for _, table_dataset_id, _ in table_sources:
+        status = pending_ingest_status(table_dataset_id)
+        if status:
+            return jsonify({"error": "Dataset is still being processed. Please try again shortly.", "status": status}), 409
+
+    table_datasets = {}
     try:
-        # Read the uploaded CSV file into a Pandas DataFrame
-        df = pd.read_csv(filePath)
+        # DuckDB reads only the columns the query uses, so the tables are not loaded here
+        for table_name, table_dataset_id, table_file_path in table_sources:
+            table_datasets[table_name] = locate_dataset(table_dataset_id, table_file_path)
+    except KeyError:
+        return jsonify({"error": "Dataset not found. Please upload the file again."}), 404
     except Exception as e:
         # Handle errors during file reading
-        return jsonify({"error": f"Error reading CSV file: {str(e)}"}), 400
+        return jsonify({"error": f"Error reading dataset file: {str(e)}"}), 400
 
+    # Pin every table to one version, so the prompt and the query see the same
+    # rows even if an append lands while the request runs
+    table_versions = {}
     try:
-        # Get comprehensive schema information
-        schema_info = get_schema_info(df)
+        for table_name, table_dataset_id in table_datasets.items():
+            table_versions[table_name] = dataset_manifest(table_dataset_id, version)["version"]
+    except KeyError:
+        return jsonify({"error": "Dataset version not found."}), 404
+
+    try:
+        # Get comprehensive schema information, precomputed by the ingest job
+        tables = {
+            table_name: get_dataset_profile(table_dataset_id, version=table_versions[table_name])
+            for table_name, table_dataset_id in table_datasets.items()
+        }
         
         # Create optimized prompt with schema information
-        prompt = create_optimized_prompt(text_input, schema_info)
+        # Partitioned tables get filter hints so their queries skip partitions
+        partitioning = {}
+        for table_name in tables:
+            split = dataset_partitioning(table_datasets[table_name])
+            if split:
+                partitioning[table_name] = split
+        prompt = create_optimized_prompt(
+            text_input,
+            tables,
+            find_join_keys(tables) if len(tables) > 1 else None,
+            partitioning
+        )
         
         print(f"Optimized prompt: {prompt}")
         
@@ -553,14 +2035,21 @@ def generate_sql():
         sql_query = sql_query[6:].strip()
         
     # Ensure table name consistency
-    sql_query = sql_query.replace("your_table_name", "uploaded_csv")
-    sql_query = sql_query.replace("table_name", "uploaded_csv")
+    if not workspace_id:
+        sql_query = sql_query.replace("your_table_name", "uploaded_csv")
+        sql_query = sql_query.replace("table_name", "uploaded_csv")
 
     # Execute the SQL query using DuckDB
     try:
-        conn = duckdb.connect()
-        conn.register('uploaded_csv', df)  # Register the DataFrame as a table in DuckDB
-        output_table = conn.execute(sql_query).fetchdf()  # Execute the query and fetch the result
+        if workspace_id:
+            conn = open_workspace_connection(table_datasets, table_versions)  # Every workspace table, attached read-only
+        else:
+            # Read-only view of the dataset's DuckDB file
+            conn = open_dataset_connection(table_datasets["uploaded_csv"], table_versions["uploaded_csv"])
+        try:
+            output_table = conn.execute(sql_query).fetchdf()  # Execute the query and fetch the result
+        finally:
+            conn.close()
         
         print(f"Query executed successfully. Result shape: {output_table.shape}")
     except Exception as e:
@@ -578,7 +2067,11 @@ def generate_sql():
     return Response(
         csv_data,
         mimetype='text/csv',
-        headers={"Content-Disposition": "attachment; filename=output.csv"}
+        headers={
+            "Content-Disposition": "attachment; filename=output.csv",
+            # Versions the result was computed from, e.g. "uploaded_csv=3"
+            "X-Dataset-Versions": ", ".join(f"{name}={v}" for name, v in table_versions.items())
+        }
     )
 
 @app.route('/analyze_data', methods=['POST'])
@@ -607,6 +2100,7 @@ def analyze_data():
 
     original_query = data['query']
     output_data = data['data']
+    dataset_context = describe_source_dataset(data.get('dataset_id'), data.get('filePath'))
     
     try:
         # Convert the data to a more readable format for analysis
@@ -634,7 +2128,7 @@ You are an expert data analyst. Analyze the following dataset and provide intell
 
 Original User Query: "{original_query}"
 
-{data_summary}
+{dataset_context}{data_summary}
 
 Please provide a comprehensive analysis that includes:
 1. **Key Insights**: What are the most important findings from this data?
@@ -693,6 +2187,7 @@ def chat_with_data():
     output_data = data['data']
     original_query = data['original_query']
     conversation_history = data.get('conversation_history', [])
+    dataset_context = describe_source_dataset(data.get('dataset_id'), data.get('filePath'))
     
     try:
         # Convert the data to a more readable format for analysis
@@ -734,7 +2229,7 @@ You are a friendly, expert data analyst having a conversation with a user about
 6. Keep responses concise but informative (2-3 sentences usually)
 7. Use simple language and avoid technical jargon when possible
 
-{data_context}
+{dataset_context}{data_context}
 {conversation_context}
 
 User's Current Question: "{user_question}"
@@ -0,0 +1,84 @@
+"""
+Compare the pandas CSV loader with DuckDB's parallel read_csv loader used at ingest.
+
+DuckDB is timed at several thread counts to show how load time scales with the
+cores given to a worker.
+
+Usage:
+    python benchmarks/bench_csv_loader.py                       # 1M and 10M rows
+    python benchmarks/bench_csv_loader.py --rows 1000000 --threads 1 2 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ingest import read_csv_into_table, sql_string  # noqa: E402
+
+
+def make_synthetic_csv(path, rows):
+    """
+    Write a synthetic sales CSV with integer, decimal, text and date columns.
+    """
+    conn = duckdb.connect()
+    conn.execute(f"""
+        COPY (
+            SELECT
+                i AS order_id,
+                DATE '2020-01-01' + CAST(i % 1826 AS INTEGER) AS order_date,
+                ['North', 'South', 'East', 'West'][CAST(i % 4 AS INTEGER) + 1] AS region,
+                'Category ' || CAST(hash(i) % 25 AS VARCHAR) AS category,
+                CAST(hash(i * 7) % 50 AS INTEGER) + 1 AS quantity,
+                ROUND(CAST(hash(i * 13) % 50000 AS DOUBLE) / 100, 2) AS unit_price,
+                'customer_' || CAST(hash(i * 31) % {max(rows // 10, 1)} AS VARCHAR) AS customer
+            FROM range({rows}) t(i)
+        ) TO {sql_string(path)} (HEADER)
+    """)
+    conn.close()
+
+
+def time_pandas(csv_path):
+    start = time.perf_counter()
+    pd.read_csv(csv_path, low_memory=False)
+    return time.perf_counter() - start
+
+
+def time_duckdb(csv_path, threads):
+    conn = duckdb.connect(config={"threads": threads})
+    start = time.perf_counter()
+    read_csv_into_table(conn, csv_path)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000], help="row counts for synthetic files")
+    parser.add_argument("--threads", type=int, nargs="+", help="DuckDB thread counts (default: 1, 2, 4, ... up to the core count)")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    thread_counts = args.threads or sorted({min(2 ** i, cores) for i in range(cores.bit_length() + 1)})
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in args.rows:
+            csv_path = os.path.join(tmp_dir, f"synthetic_{rows}.csv")
+            make_synthetic_csv(csv_path, rows)
+            print(f"{rows:,} rows ({os.path.getsize(csv_path) / 1e6:.1f} MB)")
+
+            pandas_seconds = time_pandas(csv_path)
+            print(f"  pandas read_csv              {pandas_seconds:8.3f} s")
+            for threads in thread_counts:
+                duckdb_seconds = time_duckdb(csv_path, threads)
+                print(f"  duckdb read_csv {threads:3d} thread(s) {duckdb_seconds:8.3f} s   ({pandas_seconds / duckdb_seconds:.1f}x)")
+            os.remove(csv_path)
+
+
+if __name__ == "__main__":
+    main()
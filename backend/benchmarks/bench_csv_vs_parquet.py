@@ -0,0 +1,79 @@
+"""
+Compare dataset load times from the raw CSV and from the Parquet copy written at ingest.
+
+Usage:
+    python benchmarks/bench_csv_vs_parquet.py                 # synthetic files
+    python benchmarks/bench_csv_vs_parquet.py data1.csv data2.csv
+    python benchmarks/bench_csv_vs_parquet.py --rows 5000000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ingest import ingest_file, load_parquet  # noqa: E402
+from bench_utils import best_time  # noqa: E402
+
+
+def make_synthetic_csv(path, rows, seed=0):
+    """
+    Write a sales-like CSV with numeric, categorical, date and free-text columns.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "order_id": np.arange(rows),
+        "order_date": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 5 * 365, rows), unit="D"),
+        "region": rng.choice(["North", "South", "East", "West"], rows),
+        "category": rng.choice([f"Category {i}" for i in range(25)], rows),
+        "quantity": rng.integers(1, 50, rows),
+        "unit_price": rng.uniform(1, 500, rows).round(2),
+        "discount": rng.uniform(0, 0.3, rows).round(3),
+        "customer": [f"customer_{i}" for i in rng.integers(0, rows // 10 + 1, rows)],
+    })
+    df.to_csv(path, index=False)
+
+
+def bench_file(csv_path, repeat):
+    parquet_path = os.path.splitext(csv_path)[0] + ".bench.parquet"
+    db_path = os.path.splitext(csv_path)[0] + ".bench.duckdb"
+    ingest_file(csv_path, parquet_path, db_path)
+    os.remove(db_path)
+
+    csv_seconds = best_time(lambda: pd.read_csv(csv_path, low_memory=False), repeat)
+    parquet_seconds = best_time(lambda: load_parquet(parquet_path), repeat)
+
+    csv_mb = os.path.getsize(csv_path) / 1e6
+    parquet_mb = os.path.getsize(parquet_path) / 1e6
+    os.remove(parquet_path)
+
+    print(f"{os.path.basename(csv_path)}")
+    print(f"  size:    CSV {csv_mb:9.1f} MB   Parquet {parquet_mb:9.1f} MB")
+    print(f"  load:    CSV {csv_seconds:9.3f} s    Parquet {parquet_seconds:9.3f} s")
+    print(f"  speedup: {csv_seconds / parquet_seconds:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="CSV files to benchmark (synthetic files are generated if omitted)")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000], help="row counts for synthetic files")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the best one is reported")
+    args = parser.parse_args()
+
+    if args.files:
+        for path in args.files:
+            bench_file(path, args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in args.rows:
+            csv_path = os.path.join(tmp_dir, f"synthetic_{rows}.csv")
+            make_synthetic_csv(csv_path, rows)
+            bench_file(csv_path, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Measure how profiling a wide table scales when profile_database_table splits
+its columns across processes, as profile_base_table does with PROFILE_WORKERS.
+
+A synthetic table with several hundred numeric, text and date columns is
+ingested like an upload, then profiled from its DuckDB file with 1, 2, 4, ...
+worker processes, up to the number of cores. Every process opens the database
+file itself, so what is timed includes the processes' own reads. The process
+pool is warmed up first, since the app keeps it between profiles.
+
+Usage:
+    python benchmarks/bench_parallel_profiler.py
+    python benchmarks/bench_parallel_profiler.py --columns 500 --rows 200000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ingest import ingest_file  # noqa: E402
+from profiling import MIN_COLUMNS_PER_PROCESS, profile_database_table  # noqa: E402
+from bench_profiler import make_csv  # noqa: E402
+from bench_utils import best_time  # noqa: E402
+
+
+def bench(columns, rows, workers, exact_distinct, repeat, tmp_dir):
+    csv_path = os.path.join(tmp_dir, f"wide_{columns}x{rows}.csv")
+    parquet_path = os.path.join(tmp_dir, f"wide_{columns}x{rows}.parquet")
+    db_path = os.path.join(tmp_dir, f"wide_{columns}x{rows}.duckdb")
+    make_csv(csv_path, columns, rows)
+    ingest_file(csv_path, parquet_path, db_path)
+
+    distinct = "exact" if exact_distinct else "approximate"
+    print(f"{columns} columns x {rows} rows, {distinct} distinct counts, {os.cpu_count()} cores")
+    baseline = None
+    for count in workers:
+        def run():
+            return profile_database_table(
+                db_path, "main.uploaded_csv", workers=count, exact_distinct=exact_distinct, sketches={}
+            )
+        run()
+        seconds = best_time(run, repeat)
+        baseline = baseline or seconds
+        processes = max(1, min(count, columns // MIN_COLUMNS_PER_PROCESS))
+        print(f"  {count:2d} workers ({processes:2d} processes): {seconds:8.3f} s   speedup {baseline / seconds:.2f}x")
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--columns", type=int, default=300, help="width of the synthetic table")
+    parser.add_argument("--rows", type=int, default=100_000, help="rows of the synthetic table")
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers, help="worker counts to compare")
+    parser.add_argument("--exact", action="store_true", help="count distinct values exactly")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the best one is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bench(args.columns, args.rows, args.workers, args.exact, args.repeat, tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
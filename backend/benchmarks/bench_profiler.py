@@ -0,0 +1,123 @@
+"""
+Compare the per-column pandas profiler that get_schema_info used to be with
+profile_relation, which builds the same schema_info in one DuckDB scan.
+
+Each synthetic table is ingested like an upload. The pandas profiler runs as
+the app ran it, on a DataFrame read from the dataset's Parquet copy; reading
+the file is not timed. profile_relation runs on the dataset's DuckDB file,
+with the number of DuckDB threads given, and builds the columns' sketches as
+the app does: by default in its single scan, estimating distinct counts from
+them, and with exact distinct counts in an aggregate query plus a second scan
+for the sketches. Both a wide table (many columns) and a tall one (many rows)
+with numeric, text and date columns are profiled.
+
+Usage:
+    python benchmarks/bench_profiler.py
+    python benchmarks/bench_profiler.py --wide 100x500000 --tall 10x5000000 --threads 1 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ingest import ingest_file, load_parquet, sql_string  # noqa: E402
+from profiling import profile_relation  # noqa: E402
+from bench_utils import best_time  # noqa: E402
+
+
+def make_csv(path, columns, rows):
+    """
+    Write a synthetic CSV with an id, then numeric, text and date columns in turn.
+    """
+    select_list = ["i AS id"]
+    for n in range(columns - 1):
+        kind = n % 4
+        if kind == 0:
+            select_list.append(f"CAST(hash(i * {n + 3}) % 100000 AS BIGINT) AS int_{n}")
+        elif kind == 1:
+            select_list.append(f"ROUND(CAST(hash(i * {n + 3}) % 100000 AS DOUBLE) / 100, 2) AS float_{n}")
+        elif kind == 2:
+            select_list.append(f"'value_' || CAST(hash(i * {n + 3}) % 500 AS VARCHAR) AS text_{n}")
+        else:
+            select_list.append(f"DATE '2020-01-01' + CAST(hash(i * {n + 3}) % 1826 AS INTEGER) AS date_{n}")
+    conn = duckdb.connect()
+    conn.execute(f"COPY (SELECT {', '.join(select_list)} FROM range({rows}) t(i)) TO {sql_string(path)} (HEADER)")
+    conn.close()
+
+
+def pandas_schema_info(df):
+    """
+    The previous get_schema_info: several pandas passes over every column.
+    """
+    schema_info = {"columns": [], "total_rows": len(df), "sample_data": df.head(3).to_dict('records')}
+    for col in df.columns:
+        dtype = df[col].dtype
+        col_info = {
+            "name": col,
+            "type": str(dtype),
+            "non_null_count": df[col].count(),
+            "null_count": df[col].isnull().sum(),
+            "unique_values": df[col].nunique(),
+        }
+        if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+            col_info["sample_values"] = df[col].dropna().unique()[:5].tolist()
+        elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            col_info["min_value"] = df[col].min()
+            col_info["max_value"] = df[col].max()
+            col_info["mean_value"] = round(df[col].mean(), 2) if pd.notna(df[col].mean()) else None
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            col_info["min_date"] = str(df[col].min())
+            col_info["max_date"] = str(df[col].max())
+        schema_info["columns"].append(col_info)
+    return schema_info
+
+
+def bench(label, columns, rows, threads, repeat, tmp_dir):
+    csv_path = os.path.join(tmp_dir, f"{label}.csv")
+    parquet_path = os.path.join(tmp_dir, f"{label}.parquet")
+    db_path = os.path.join(tmp_dir, f"{label}.duckdb")
+    make_csv(csv_path, columns, rows)
+    ingest_file(csv_path, parquet_path, db_path)
+
+    df = load_parquet(parquet_path)
+    pandas_seconds = best_time(lambda: pandas_schema_info(df), repeat)
+    del df
+    print(f"{label}: {rows} rows x {columns} columns")
+    print(f"  pandas, per column:                 {pandas_seconds:8.3f} s")
+    for count in threads:
+        conn = duckdb.connect(db_path, read_only=True, config={"threads": count})
+        seconds = best_time(lambda: profile_relation(conn, "main.uploaded_csv", sketches={}), repeat)
+        exact_seconds = best_time(
+            lambda: profile_relation(conn, "main.uploaded_csv", exact_distinct=True, sketches={}), repeat
+        )
+        conn.close()
+        print(f"  DuckDB, single scan,    {count:2d} threads: {seconds:8.3f} s   speedup {pandas_seconds / seconds:.1f}x")
+        print(f"  DuckDB, exact distinct, {count:2d} threads: {exact_seconds:8.3f} s   "
+              f"speedup {pandas_seconds / exact_seconds:.1f}x")
+
+
+def parse_shape(value):
+    columns, rows = value.lower().split("x")
+    return int(columns), int(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wide", type=parse_shape, default=(100, 200_000), help="wide table shape, COLUMNSxROWS")
+    parser.add_argument("--tall", type=parse_shape, default=(10, 2_000_000), help="tall table shape, COLUMNSxROWS")
+    parser.add_argument("--threads", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}),
+                        help="DuckDB thread counts to run the profiler with")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the best one is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bench("wide", *args.wide, args.threads, args.repeat, tmp_dir)
+        bench("tall", *args.tall, args.threads, args.repeat, tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
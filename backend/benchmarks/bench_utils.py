@@ -0,0 +1,16 @@
+"""
+Helpers shared by the benchmark scripts in this directory.
+"""
+import time
+
+
+def best_time(fn, repeat):
+    """
+    Run fn repeat times and return the fastest run, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
@@ -0,0 +1,95 @@
+"""
+Measure what a query on a wide table costs when only the columns it references
+are read, as /generate_sql does by running it on the dataset's DuckDB file,
+against materializing every column in pandas first.
+
+A synthetic table with 150 columns is ingested, then a query touching a few of
+its columns is timed both ways, followed by DuckDB queries touching more and
+more columns to show that cost grows with the columns used.
+
+Usage:
+    python benchmarks/bench_wide_projection.py                  # 100k and 500k rows
+    python benchmarks/bench_wide_projection.py --rows 1000000 --columns 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ingest import ingest_file, load_parquet, sql_identifier, sql_string  # noqa: E402
+from bench_utils import best_time  # noqa: E402
+
+
+def make_wide_csv(path, rows, columns):
+    """
+    Write a synthetic CSV with an id, a region and a date column followed by
+    numeric and text measure columns, up to the requested width.
+    """
+    select_list = [
+        "i AS id",
+        "['North', 'South', 'East', 'West'][CAST(i % 4 AS INTEGER) + 1] AS region",
+        "DATE '2020-01-01' + CAST(i % 1826 AS INTEGER) AS order_date",
+    ]
+    for n in range(columns - len(select_list)):
+        if n % 5 == 4:
+            select_list.append(f"'label_' || CAST(hash(i * {n + 3}) % 1000 AS VARCHAR) AS text_{n}")
+        else:
+            select_list.append(f"ROUND(CAST(hash(i * {n + 3}) % 100000 AS DOUBLE) / 100, 2) AS metric_{n}")
+    conn = duckdb.connect()
+    conn.execute(f"COPY (SELECT {', '.join(select_list)} FROM range({rows}) t(i)) TO {sql_string(path)} (HEADER)")
+    conn.close()
+
+
+def metric_query(metric_columns, table="uploaded_csv"):
+    sums = ", ".join(f"SUM({sql_identifier(name)})" for name in metric_columns)
+    return f"SELECT region, {sums} FROM {table} WHERE order_date >= DATE '2023-01-01' GROUP BY region"
+
+
+def bench(rows, columns, repeat, tmp_dir):
+    csv_path = os.path.join(tmp_dir, f"wide_{rows}.csv")
+    parquet_path = os.path.join(tmp_dir, f"wide_{rows}.parquet")
+    db_path = os.path.join(tmp_dir, f"wide_{rows}.duckdb")
+    make_wide_csv(csv_path, rows, columns)
+    ingest_file(csv_path, parquet_path, db_path)
+
+    conn = duckdb.connect(db_path, read_only=True)
+    metrics = [row[0] for row in conn.execute("DESCRIBE uploaded_csv").fetchall() if row[0].startswith("metric_")]
+    query = metric_query(metrics[:1])
+
+    def materialized():
+        df = load_parquet(parquet_path)
+        duckdb.connect().execute(query.replace("uploaded_csv", "df")).fetchall()
+        return df
+
+    df = materialized()
+    materialized_mb = df.memory_usage(index=True, deep=True).sum() / 1e6
+    del df
+    materialized_seconds = best_time(materialized, repeat)
+    projected_seconds = best_time(lambda: conn.execute(query).fetchall(), repeat)
+
+    print(f"{rows} rows x {columns} columns (query reads 3 columns)")
+    print(f"  all columns in pandas: {materialized_seconds:8.3f} s   {materialized_mb:9.1f} MB materialized")
+    print(f"  DuckDB projection:     {projected_seconds:8.3f} s   speedup {materialized_seconds / projected_seconds:.1f}x")
+    for width in sorted({1, 10, len(metrics) // 2, len(metrics)}):
+        seconds = best_time(lambda: conn.execute(metric_query(metrics[:width])).fetchall(), repeat)
+        print(f"  DuckDB, {width + 2:3d} columns read: {seconds:8.3f} s")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 500_000], help="row counts for synthetic tables")
+    parser.add_argument("--columns", type=int, default=150, help="width of the synthetic table")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the best one is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in args.rows:
+            bench(rows, args.columns, args.repeat, tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
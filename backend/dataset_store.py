@@ -0,0 +1,257 @@
+import hashlib
+import os
+import re
+import shutil
+import uuid
+
+from local_files import checked_id, file_lock, is_store_id, read_json, write_json
+
+
+# Files of a dataset that describe it alone and are not carried over to its forks
+UNSHARED_FILES = ("metadata.json", "status.json", "access.json", ".lock", "source", "data.duckdb.wal", "versions")
+
+
+def new_dataset_hasher():
+    """
+    Incremental hasher for streamed content; its hexdigest() is the dataset_id.
+    """
+    return hashlib.sha256()
+
+
+def derived_dataset_id(parent_id, segment_id):
+    """
+    dataset_id of the dataset made by appending the rows with segment_id to
+    parent_id, so appending the same rows again resolves to the same dataset.
+    """
+    return hashlib.sha256(f"{parent_id}+{segment_id}".encode("ascii")).hexdigest()
+
+
+class DatasetStore:
+    """
+    Local on-disk layout for ingested datasets.
+
+    Every dataset gets its own directory, named after its dataset_id, holding a
+    local copy of the uploaded file, the Parquet copy, a DuckDB database file with
+    the table loaded natively, a metadata.json describing where the original lives and a status.json with the
+    progress of its ingest job. Large datasets also get a hive-partitioned
+    Parquet copy under partitions/. Rows appended later live under segments/, one
+    Parquet file and one profile JSON per append. An append never changes its
+    dataset: it makes a fork, a new dataset that hard-links its parent's files
+    and adds the segment. Every upload and append creates an immutable version, described by a manifest under versions/, whose
+    profile (schema_info) is kept under profiles/ once computed. sketches/ holds
+    the distinct-value sketches of the uploaded rows, of each segment and of
+    each version. _sources/ maps the filePath of every stored original back to
+    its dataset_id. The directory is shared by all workers on the host.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def dataset_dir(self, dataset_id, create=False):
+        path = os.path.join(self.root, checked_id(dataset_id, "dataset_id", 64))
+        if create:
+            os.makedirs(path, exist_ok=True)
+        return path
+
+    def list_datasets(self):
+        """
+        dataset_ids of every dataset with a directory in the store.
+        """
+        return [name for name in os.listdir(self.root) if is_store_id(name, 64)]
+
+    def path(self, dataset_id, name):
+        return os.path.join(self.dataset_dir(dataset_id), name)
+
+    def fork(self, parent_id, dataset_id):
+        """
+        Give a new dataset the data files, profiles and sketches of parent_id.
+        They are hard-linked when the disk allows it, so nothing is copied;
+        files in the store are only ever replaced, never changed in place, so
+        the two datasets stay independent. Metadata, manifests and records of
+        ingest and use are not carried over.
+        """
+        parent_dir = self.dataset_dir(parent_id)
+        self.dataset_dir(dataset_id, create=True)
+        for name in os.listdir(parent_dir):
+            if name in UNSHARED_FILES or name.endswith(".tmp"):
+                continue
+            if os.path.isdir(os.path.join(parent_dir, name)):
+                shutil.copytree(
+                    os.path.join(parent_dir, name),
+                    self.path(dataset_id, name),
+                    ignore=shutil.ignore_patterns("*.tmp"),
+                    copy_function=link_or_copy
+                )
+            else:
+                link_or_copy(os.path.join(parent_dir, name), self.path(dataset_id, name))
+
+    def remove(self, dataset_id):
+        shutil.rmtree(self.dataset_dir(dataset_id), ignore_errors=True)
+
+    def source_path(self, dataset_id):
+        return self.path(dataset_id, "source")
+
+    def incoming_path(self):
+        """
+        Fresh path for spooling a file whose dataset_id is not known yet.
+        """
+        incoming_dir = os.path.join(self.root, "_incoming")
+        os.makedirs(incoming_dir, exist_ok=True)
+        return os.path.join(incoming_dir, f"{uuid.uuid4().hex}.part")
+
+    def adopt_source(self, dataset_id, spooled_path):
+        """
+        Move a fully spooled upload into the dataset's directory as its source file.
+        """
+        self.dataset_dir(dataset_id, create=True)
+        path = self.source_path(dataset_id)
+        os.replace(spooled_path, path)
+        return path
+
+    def parquet_path(self, dataset_id):
+        return self.path(dataset_id, "data.parquet")
+
+    def has_parquet(self, dataset_id):
+        return os.path.exists(self.parquet_path(dataset_id))
+
+    def duckdb_path(self, dataset_id):
+        return self.path(dataset_id, "data.duckdb")
+
+    def has_duckdb(self, dataset_id):
+        return os.path.exists(self.duckdb_path(dataset_id))
+
+    def partitions_dir(self, dataset_id):
+        return self.path(dataset_id, "partitions")
+
+    def has_partitions(self, dataset_id):
+        return os.path.isdir(self.partitions_dir(dataset_id))
+
+    def segment_path(self, dataset_id, segment_id):
+        segments_dir = self.path(dataset_id, "segments")
+        os.makedirs(segments_dir, exist_ok=True)
+        return os.path.join(segments_dir, f"{segment_id}.parquet")
+
+    def has_segment(self, dataset_id, segment_id):
+        return os.path.exists(self.segment_path(dataset_id, segment_id))
+
+    def lock(self, dataset_id):
+        """
+        Hold an exclusive lock on a dataset, across all workers on the host, while
+        its files are updated in place.
+        """
+        self.dataset_dir(dataset_id, create=True)
+        return file_lock(self.path(dataset_id, ".lock"))
+
+    def read_json(self, dataset_id, name):
+        return read_json(self.path(dataset_id, name))
+
+    def write_json(self, dataset_id, name, data, compact=False):
+        """
+        Atomically replace one of the dataset's JSON files, see local_files.write_json.
+        """
+        self.dataset_dir(dataset_id, create=True)
+        write_json(self.path(dataset_id, name), data, compact=compact)
+
+    def _source_path(self, source):
+        key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, "_sources", f"{key}.json")
+
+    def register_source(self, source, dataset_id):
+        """
+        Remember that the file at source (a storage location or URL) is dataset_id.
+        """
+        os.makedirs(os.path.join(self.root, "_sources"), exist_ok=True)
+        write_json(self._source_path(source), {"source": source, "dataset_id": dataset_id})
+
+    def dataset_for_source(self, source):
+        """
+        The dataset_id registered for source, or None.
+        """
+        entry = read_json(self._source_path(source))
+        return entry["dataset_id"] if entry else None
+
+    def read_metadata(self, dataset_id):
+        """
+        Return the stored metadata for a dataset, or None if it was never ingested here.
+        """
+        return self.read_json(dataset_id, "metadata.json")
+
+    def write_metadata(self, dataset_id, metadata):
+        self.write_json(dataset_id, "metadata.json", metadata)
+
+    def read_status(self, dataset_id):
+        """
+        Return the latest ingest job status for a dataset, or None if it has none.
+        """
+        return self.read_json(dataset_id, "status.json")
+
+    def write_status(self, dataset_id, status):
+        self.write_json(dataset_id, "status.json", status)
+
+    def read_manifest(self, dataset_id, version):
+        """
+        Return the manifest of a dataset version, or None if there is no such version.
+        """
+        return self.read_json(dataset_id, f"versions/{int(version)}.json")
+
+    def write_manifest(self, dataset_id, manifest):
+        """
+        Write the manifest of a new dataset version. Manifests are written once,
+        before the version becomes current, and never changed afterwards.
+        """
+        os.makedirs(self.path(dataset_id, "versions"), exist_ok=True)
+        self.write_json(dataset_id, f"versions/{int(manifest['version'])}.json", manifest)
+
+    def read_profile(self, dataset_id, version):
+        """
+        Return the stored schema_info of a dataset version, or None if it has not
+        been profiled on this host.
+        """
+        return self.read_json(dataset_id, f"profiles/{int(version)}.json")
+
+    def write_profile(self, dataset_id, version, profile):
+        """
+        Store the schema_info of a dataset version. Versions never change, so
+        a profile is only ever replaced by a more exact one.
+        """
+        os.makedirs(self.path(dataset_id, "profiles"), exist_ok=True)
+        self.write_json(dataset_id, f"profiles/{int(version)}.json", profile, compact=True)
+
+    def delete_profiles(self, dataset_id, from_version):
+        """
+        Remove the stored profiles of from_version and later versions, e.g.
+        after the profile they were merged from has been replaced.
+        """
+        try:
+            names = os.listdir(self.path(dataset_id, "profiles"))
+        except FileNotFoundError:
+            return
+        for name in names:
+            if re.fullmatch(r"[0-9]+\.json", name) and int(name[:-5]) >= from_version:
+                os.remove(self.path(dataset_id, os.path.join("profiles", name)))
+
+    def read_sketches(self, dataset_id, name):
+        """
+        Return the stored column sketches named name, e.g. a segment_id or
+        "version-3", or None if there are none.
+        """
+        return self.read_json(dataset_id, f"sketches/{name}.json")
+
+    def write_sketches(self, dataset_id, name, sketches):
+        os.makedirs(self.path(dataset_id, "sketches"), exist_ok=True)
+        self.write_json(dataset_id, f"sketches/{name}.json", sketches, compact=True)
+
+    def read_segment_profile(self, dataset_id, segment_id):
+        return self.read_json(dataset_id, f"segments/{segment_id}.json")
+
+    def write_segment_profile(self, dataset_id, segment_id, profile):
+        self.write_json(dataset_id, f"segments/{segment_id}.json", profile)
+
+
+def link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
@@ -0,0 +1,575 @@
+import bz2
+import gzip
+import os
+import shutil
+import uuid
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+# Parquet settings for the columnar copy written at ingest time
+PARQUET_COMPRESSION = "zstd"
+PARQUET_ROW_GROUP_SIZE = 100_000
+# Leading bytes of the compressed upload formats we accept
+COMPRESSION_MAGIC = {
+    "gzip": b"\x1f\x8b",
+    "zstd": b"\x28\xb5\x2f\xfd",
+    "bz2": b"BZh",
+}
+# Compressions DuckDB's CSV and JSON readers inflate themselves while they stream the file
+DUCKDB_TEXT_COMPRESSIONS = ("gzip", "zstd")
+# Dataset file formats accepted for upload; all of them load into the same table
+TEXT_FORMATS = ("csv", "json")
+# Chunk size used when inflating formats DuckDB cannot read directly
+DECOMPRESS_CHUNK_SIZE = 8 * 1024 * 1024
+# Text columns with at most this many distinct values, each repeated on average
+# at least twice, are stored as ENUMs (dictionary encoded)
+ENUM_MAX_VALUES = 1000
+ENUM_MAX_DISTINCT_RATIO = 0.5
+# Date formats tried on text columns that DuckDB's readers left as VARCHAR
+DATE_FORMATS = (
+    "%m/%d/%Y", "%d/%m/%Y", "%Y/%m/%d", "%d-%m-%Y", "%d.%m.%Y",
+    "%m/%d/%Y %H:%M:%S", "%d/%m/%Y %H:%M:%S", "%m/%d/%Y %H:%M", "%d/%m/%Y %H:%M",
+)
+# Partitioned copies: category columns with at most this many values may be the
+# partition key, and the hive key column added to every file to name its directory
+PARTITION_MAX_VALUES = 64
+PARTITION_KEY = "__partition"
+# Bytes per value of fixed-width types in DuckDB's in-memory vectors, used for memory estimates
+TYPE_WIDTHS = {
+    "BOOLEAN": 1, "TINYINT": 1, "SMALLINT": 2, "INTEGER": 4, "BIGINT": 8, "HUGEINT": 16,
+    "UTINYINT": 1, "USMALLINT": 2, "UINTEGER": 4, "UBIGINT": 8, "FLOAT": 4, "DOUBLE": 8,
+    "DATE": 4, "TIME": 8, "TIMESTAMP": 8, "TIMESTAMP WITH TIME ZONE": 8,
+}
+# A string takes 16 bytes in a vector, and strings longer than 12 bytes are also copied to a heap
+STRING_WIDTH = 16
+INLINE_STRING_BYTES = 12
+
+
+def sql_identifier(name):
+    """
+    Quote a column or table name as a SQL identifier.
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def sql_string(value):
+    """
+    Quote a value as a SQL string literal, for statements such as COPY that
+    do not accept prepared parameters.
+    """
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def remove_files(*paths):
+    """
+    Remove files, such as the temporary files of a failed write, skipping any
+    that do not exist.
+    """
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def spool_stream(stream, path, chunk_size, hasher=None):
+    """
+    Copy a binary stream to path in fixed-size chunks, so memory use is bounded
+    by chunk_size whatever the size of the file. If a hasher is given it is
+    updated with every chunk. Returns the number of bytes written.
+    """
+    total_bytes = 0
+    with open(path, "wb") as f:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            if hasher is not None:
+                hasher.update(chunk)
+            f.write(chunk)
+            total_bytes += len(chunk)
+    return total_bytes
+
+
+def detect_compression(path):
+    """
+    Identify a gzip, zstd or bz2 file from its leading bytes. Returns the
+    compression name, or None for an uncompressed file.
+    """
+    with open(path, "rb") as f:
+        head = f.read(4)
+    for compression, magic in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_decompressed(path, compression):
+    """
+    Open a file as a stream of its decompressed bytes.
+    """
+    if compression is None:
+        return open(path, "rb")
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "bz2":
+        return bz2.open(path, "rb")
+    if compression == "zstd":
+        return pa.CompressedInputStream(path, "zstd")
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+def decompress_file(path, compression, dest_path, chunk_size=DECOMPRESS_CHUNK_SIZE):
+    """
+    Inflate a compressed file to dest_path as a stream, holding at most
+    chunk_size bytes of it in memory. Returns the number of bytes written.
+    """
+    with open_decompressed(path, compression) as stream:
+        return spool_stream(stream, dest_path, chunk_size)
+
+
+def detect_format(path, compression=None):
+    """
+    Identify a dataset file as "parquet", "xlsx", "json" (NDJSON or a JSON
+    array) or "csv" from the first bytes of its decompressed content.
+    """
+    with open_decompressed(path, compression) as stream:
+        head = stream.read(64)
+    if head.startswith(b"PAR1"):
+        return "parquet"
+    if head.startswith(b"PK\x03\x04"):
+        return "xlsx"
+    if head.removeprefix(b"\xef\xbb\xbf").lstrip().startswith((b"{", b"[")):
+        return "json"
+    return "csv"
+
+
+def read_csv_into_table(conn, csv_path, table_name="uploaded_csv", compression=None):
+    """
+    Load a CSV into a DuckDB table with the multi-threaded read_csv reader.
+
+    Delimiter, quoting, header and column types are sniffed by DuckDB. If a value
+    beyond the sniffer's sample does not fit the guessed type, the load is
+    retried with types inferred from the whole file. gzip and zstd files are
+    decompressed by DuckDB as it reads them.
+    """
+    params = [csv_path, compression or "none"]
+    try:
+        conn.execute(
+            f'CREATE OR REPLACE TABLE "{table_name}" AS SELECT * FROM read_csv(?, auto_detect=true, compression=?)',
+            params
+        )
+    except (duckdb.ConversionException, duckdb.InvalidInputException) as e:
+        print(f"⚠️ CSV type sniffing failed, rescanning the whole file: {str(e).splitlines()[0]}")
+        conn.execute(
+            f'CREATE OR REPLACE TABLE "{table_name}" AS SELECT * FROM read_csv(?, auto_detect=true, compression=?, sample_size=-1)',
+            params
+        )
+
+
+def export_parquet(conn, table_name, parquet_path):
+    """
+    Write a typed, compressed Parquet copy of a DuckDB table.
+    Row groups carry min/max statistics so readers can skip data they do not need.
+    """
+    tmp_path = f"{parquet_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        conn.execute(
+            f'COPY "{table_name}" TO {sql_string(tmp_path)} '
+            f'(FORMAT PARQUET, COMPRESSION {PARQUET_COMPRESSION}, ROW_GROUP_SIZE {PARQUET_ROW_GROUP_SIZE})'
+        )
+        os.replace(tmp_path, parquet_path)
+    except Exception:
+        remove_files(tmp_path)
+        raise
+
+
+def typed_select(relation, column_types=None):
+    """
+    SELECT every column of relation, cast to the types chosen at ingest. Parquet
+    has no ENUM type, so this restores them when a dataset is rebuilt from its
+    Parquet copy.
+    """
+    if not column_types:
+        return f"SELECT * FROM {relation}"
+    select_list = ", ".join(
+        f"CAST({sql_identifier(name)} AS {column_type}) AS {sql_identifier(name)}"
+        for name, column_type in column_types.items()
+    )
+    return f"SELECT {select_list} FROM {relation}"
+
+
+def choose_partitioning(conn, relation, column_types):
+    """
+    Pick the column to partition a dataset by: the first date or timestamp
+    column spanning more than one month, partitioned by month, else the ENUM
+    column with the most values, up to PARTITION_MAX_VALUES, partitioned by value.
+    Returns {"column", "granularity", "partitions"}, or None when no column fits.
+    """
+    date_columns = [name for name, column_type in column_types.items() if column_type.startswith(("DATE", "TIMESTAMP"))]
+    enum_columns = [name for name, column_type in column_types.items() if column_type.startswith("ENUM(")]
+    if not date_columns and not enum_columns:
+        return None
+
+    expressions = [f"COUNT(DISTINCT date_trunc('month', {sql_identifier(name)}))" for name in date_columns]
+    expressions += [f"COUNT(DISTINCT {sql_identifier(name)})" for name in enum_columns]
+    counts = conn.execute(f"SELECT {', '.join(expressions)} FROM {relation}").fetchone()
+
+    for name, months in zip(date_columns, counts):
+        if months > 1:
+            return {"column": name, "granularity": "month", "partitions": months}
+    candidates = [(values, name) for name, values in zip(enum_columns, counts[len(date_columns):]) if 1 < values <= PARTITION_MAX_VALUES]
+    if candidates:
+        values, name = max(candidates)
+        return {"column": name, "granularity": "value", "partitions": values}
+    return None
+
+
+def partition_key_sql(partitioning):
+    """
+    Expression giving the hive partition value of a row, e.g. 2024-03 for a month.
+    """
+    col = sql_identifier(partitioning["column"])
+    if partitioning["granularity"] == "month":
+        return f"strftime({col}, '%Y-%m')"
+    return f"CAST({col} AS VARCHAR)"
+
+
+def export_partitions(conn, relation, partitioning, partitions_dir):
+    """
+    Write a hive-style partitioned Parquet copy of relation, one directory per
+    partition value (partitions_dir/__partition=2024-03/...). The min/max
+    statistics of every file then cover a single partition, so filters on the
+    column skip all other files. Monthly partitions are also sorted by date,
+    which lets filters on a few days skip row groups within the month.
+
+    The copy is written under a temporary name and renamed into place; if
+    another worker finished first its copy is kept.
+    """
+    tmp_dir = f"{partitions_dir}.{uuid.uuid4().hex}.tmp"
+    order_by = f" ORDER BY {sql_identifier(partitioning['column'])}" if partitioning["granularity"] == "month" else ""
+    try:
+        conn.execute(
+            f"COPY (SELECT *, {partition_key_sql(partitioning)} AS {PARTITION_KEY} FROM {relation}{order_by}) "
+            f"TO {sql_string(tmp_dir)} (FORMAT PARQUET, PARTITION_BY ({PARTITION_KEY}), "
+            f"COMPRESSION {PARQUET_COMPRESSION}, ROW_GROUP_SIZE {PARQUET_ROW_GROUP_SIZE})"
+        )
+        os.rename(tmp_dir, partitions_dir)
+    except OSError:
+        if not os.path.isdir(partitions_dir):
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def build_partitions(parquet_path, partitions_dir, partitioning):
+    """
+    Write the partitioned copy of a dataset from its Parquet copy.
+    """
+    conn = duckdb.connect()
+    try:
+        export_partitions(conn, f"read_parquet({sql_string(parquet_path)})", partitioning, partitions_dir)
+    finally:
+        conn.close()
+
+
+def partitions_relation_sql(partitions_dir):
+    """
+    read_parquet over a partitioned copy. The hive key is left out, so the
+    relation has exactly the dataset's columns.
+    """
+    return f"read_parquet({sql_string(os.path.join(partitions_dir, '**', '*.parquet'))}, hive_partitioning=false)"
+
+
+def optimize_column_types(conn, table_name="uploaded_csv"):
+    """
+    Choose the narrowest types that hold a freshly loaded table's text columns
+    without loss, using one scan for statistics:
+
+    - text columns holding only dates or timestamps are parsed once, here;
+    - other low-cardinality text columns become ENUMs (dictionary encoded).
+
+    Numeric columns keep their types: DuckDB already bit-packs integers on
+    disk, and narrow types there would make arithmetic in queries overflow.
+
+    Returns (inferred_types, column_types, date_formats, memory_bytes): the
+    types as read, the types of the rewritten table, the strptime format each
+    text column parsed as a date or timestamp was read with, and the table's
+    estimated size in DuckDB's in-memory vectors, i.e. what a full scan holds
+    uncompressed, before and after.
+    """
+    columns = [(row[0], row[1]) for row in conn.execute(f'DESCRIBE "{table_name}"').fetchall()]
+
+    # One aggregate query collects what every column needs; offsets remember where each column's values start
+    expressions = ["COUNT(*)"]
+    offsets = []
+    for name, column_type in columns:
+        col = sql_identifier(name)
+        offsets.append(len(expressions))
+        if column_type == "VARCHAR":
+            as_timestamp = f"TRY_CAST({col} AS TIMESTAMP)"
+            expressions += [
+                f"COUNT({col})",
+                f"approx_count_distinct({col})",
+                f"SUM(strlen({col})) FILTER (WHERE strlen({col}) > {INLINE_STRING_BYTES})",
+                f"COUNT({as_timestamp})",
+                f"COUNT(*) FILTER (WHERE {as_timestamp} <> CAST({as_timestamp} AS DATE))",
+            ]
+            expressions += [f"COUNT(try_strptime({col}, {sql_string(fmt)}))" for fmt in DATE_FORMATS]
+    stats = conn.execute(f'SELECT {", ".join(expressions)} FROM "{table_name}"').fetchone()
+    total_rows = stats[0]
+
+    inferred_types = dict(columns)
+    column_types = {}
+    date_formats = {}
+    select_list = []
+    memory_before = memory_after = 0
+    for (name, column_type), offset in zip(columns, offsets):
+        col = sql_identifier(name)
+        new_type, expression = column_type, col
+        width = TYPE_WIDTHS.get(column_type, 8)
+        before = after = width * total_rows
+
+        if column_type == "VARCHAR":
+            non_null, distinct, heap_bytes, timestamps, with_time = stats[offset:offset + 5]
+            parsed_formats = stats[offset + 5:offset + 5 + len(DATE_FORMATS)]
+            before = after = STRING_WIDTH * total_rows + (heap_bytes or 0)
+            date_format = next((fmt for fmt, parsed in zip(DATE_FORMATS, parsed_formats) if non_null and parsed == non_null), None)
+            if non_null and timestamps == non_null:
+                new_type = "DATE" if with_time == 0 else "TIMESTAMP"
+                expression = f"CAST({col} AS {new_type})"
+            elif date_format:
+                new_type = "TIMESTAMP" if "%H" in date_format else "DATE"
+                expression = f"CAST(strptime({col}, {sql_string(date_format)}) AS {new_type})"
+                date_formats[name] = date_format
+            elif non_null and distinct <= ENUM_MAX_VALUES and distinct <= non_null * ENUM_MAX_DISTINCT_RATIO:
+                values = [row[0] for row in conn.execute(
+                    f'SELECT DISTINCT {col} FROM "{table_name}" WHERE {col} IS NOT NULL ORDER BY 1'
+                ).fetchall()]
+                new_type = f"ENUM({', '.join(sql_string(value) for value in values)})"
+                expression = f"CAST({col} AS {new_type})"
+                index_width = 1 if len(values) <= 255 else 2
+                after = index_width * total_rows + sum(STRING_WIDTH + len(value.encode()) for value in values)
+
+        if new_type in TYPE_WIDTHS:
+            after = TYPE_WIDTHS[new_type] * total_rows
+        column_types[name] = new_type
+        select_list.append(f"{expression} AS {col}")
+        memory_before += before
+        memory_after += after
+
+    if column_types != inferred_types:
+        conn.execute(f'CREATE OR REPLACE TABLE "{table_name}" AS SELECT {", ".join(select_list)} FROM "{table_name}"')
+    return inferred_types, column_types, date_formats, {"before": memory_before, "after": memory_after}
+
+
+def prepare_source(source_path, scratch_prefix):
+    """
+    Detect the format and compression of a dataset file and make it readable by
+    DuckDB. DuckDB reads gzip and zstd text files directly; anything else
+    compressed is first inflated, chunk by chunk, to a temporary file named
+    after scratch_prefix. Returns (path, file_format, compression, inflated_path),
+    where inflated_path is the temporary file to remove afterwards, or None.
+    """
+    compression = detect_compression(source_path)
+    file_format = detect_format(source_path, compression)
+    if compression and (file_format not in TEXT_FORMATS or compression not in DUCKDB_TEXT_COMPRESSIONS):
+        inflated_path = f"{scratch_prefix}.{uuid.uuid4().hex}.{file_format}"
+        try:
+            decompress_file(source_path, compression, inflated_path)
+        except Exception:
+            remove_files(inflated_path)
+            raise
+        return inflated_path, file_format, None, inflated_path
+    return source_path, file_format, compression, None
+
+
+def read_json_into_table(conn, json_path, table_name="uploaded_csv", compression=None):
+    """
+    Load newline-delimited JSON (or a top-level JSON array) into a DuckDB table.
+    Column types are inferred from the objects, nested ones become STRUCTs.
+    """
+    conn.execute(
+        f'CREATE OR REPLACE TABLE "{table_name}" AS SELECT * FROM read_json(?, format=\'auto\', compression=?)',
+        [json_path, compression or "uncompressed"]
+    )
+
+
+def read_excel_into_table(conn, xlsx_path, table_name="uploaded_csv"):
+    """
+    Load the first sheet of an XLSX workbook into a DuckDB table. DuckDB has no
+    built-in XLSX reader, so the sheet goes through pandas and openpyxl; Excel
+    caps a sheet at about a million rows, which bounds the memory this takes.
+    """
+    df = pd.read_excel(xlsx_path, engine="openpyxl")
+    conn.register("excel_sheet", df)
+    try:
+        conn.execute(f'CREATE OR REPLACE TABLE "{table_name}" AS SELECT * FROM excel_sheet')
+    finally:
+        conn.unregister("excel_sheet")
+
+
+def read_file_into_table(conn, path, file_format, table_name="uploaded_csv", compression=None):
+    """
+    Load a dataset file into a DuckDB table with the native reader for its format.
+    Parquet keeps its stored types and is read without any parsing.
+    """
+    if file_format == "csv":
+        read_csv_into_table(conn, path, table_name, compression)
+    elif file_format == "json":
+        read_json_into_table(conn, path, table_name, compression)
+    elif file_format == "parquet":
+        conn.execute(f'CREATE OR REPLACE TABLE "{table_name}" AS SELECT * FROM read_parquet(?)', [path])
+    elif file_format == "xlsx":
+        read_excel_into_table(conn, path, table_name)
+    else:
+        raise ValueError(f"Unsupported file format: {file_format}")
+
+
+def ingest_file(source_path, parquet_path, db_path, threads=None, memory_limit=None, table_name="uploaded_csv",
+                partitions_dir=None, partition_min_rows=None):
+    """
+    Load an uploaded dataset file straight into the dataset's DuckDB file and
+    export the Parquet copy from it, without building a pandas DataFrame.
+
+    CSV parsing runs on DuckDB's parallel reader, so load time scales with the
+    threads available to the worker. DuckDB writes the table to disk in
+    compressed row groups as it reads, and memory_limit caps how much it may hold
+    at once; anything beyond that spills to a temp directory next to the
+    database.
+
+    The format (CSV, NDJSON, Parquet or XLSX) and any gzip, zstd or bz2
+    compression are detected from the file's leading bytes, see prepare_source.
+    Column types are then narrowed once by optimize_column_types, before any
+    copy is written.
+
+    If partitions_dir is given and the table has at least partition_min_rows
+    rows, a partitioned Parquet copy is written there too, split by the column
+    choose_partitioning picks.
+
+    Returns a summary dict with total_rows, total_columns, format, the
+    inferred_types, the optimized column_types, the date_formats text dates
+    were parsed with, the table's estimated memory_bytes in DuckDB vectors
+    before and after the types were narrowed, and the partitioning used, or None.
+    """
+    source_path, file_format, compression, inflated_path = prepare_source(source_path, db_path)
+
+    config = {}
+    if threads:
+        config["threads"] = threads
+    if memory_limit:
+        config["memory_limit"] = memory_limit
+
+    tmp_path = f"{db_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        conn = duckdb.connect(tmp_path, config=config)
+        try:
+            read_file_into_table(conn, source_path, file_format, table_name, compression)
+            inferred_types, column_types, date_formats, memory_bytes = optimize_column_types(conn, table_name)
+            export_parquet(conn, table_name, parquet_path)
+            total_rows = conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+            total_columns = len(conn.execute(f'DESCRIBE "{table_name}"').fetchall())
+            partitioning = None
+            if partitions_dir and partition_min_rows and total_rows >= partition_min_rows:
+                partitioning = choose_partitioning(conn, f'"{table_name}"', column_types)
+                if partitioning:
+                    export_partitions(conn, f'"{table_name}"', partitioning, partitions_dir)
+            conn.execute("CHECKPOINT")
+        finally:
+            conn.close()
+        os.replace(tmp_path, db_path)
+    except Exception:
+        remove_files(tmp_path, f"{tmp_path}.wal")
+        raise
+    finally:
+        if inflated_path:
+            remove_files(inflated_path)
+    return {
+        "total_rows": total_rows,
+        "total_columns": total_columns,
+        "format": file_format,
+        "inferred_types": inferred_types,
+        "column_types": column_types,
+        "date_formats": date_formats,
+        "memory_bytes": memory_bytes,
+        "partitioning": partitioning
+    }
+
+
+def ingest_segment(source_path, base_parquet_path, segment_path, column_types=None, inferred_types=None,
+                   date_formats=None, table_name="uploaded_csv"):
+    """
+    Load a file of rows to append to a dataset and write them as a Parquet
+    segment with the same columns as the dataset's base Parquet copy.
+
+    Only the new file is read; the base is consulted for its schema alone.
+    Values are cast to the dataset's column_types, so dates and timestamps
+    stay dates and timestamps: text read for a column the base parsed with a
+    strptime format is parsed with the same format from date_formats. ENUM
+    columns are cast to their inferred_types instead, the types read before
+    the base was narrowed, so appended rows may hold new categories. Columns
+    missing from the file are filled with NULLs, and columns the dataset does
+    not have raise ValueError. Returns the number of rows written.
+    """
+    column_types = column_types or {}
+    inferred_types = inferred_types or {}
+    date_formats = date_formats or {}
+    source_path, file_format, compression, inflated_path = prepare_source(source_path, segment_path)
+    conn = duckdb.connect()
+    try:
+        read_file_into_table(conn, source_path, file_format, "segment", compression)
+        base_columns = []
+        for name, parquet_type, *_ in conn.execute(f"DESCRIBE SELECT * FROM read_parquet({sql_string(base_parquet_path)})").fetchall():
+            column_type = column_types.get(name, parquet_type)
+            if column_type.startswith("ENUM("):
+                column_type = inferred_types.get(name, "VARCHAR")
+            base_columns.append((name, column_type))
+        segment_types = {row[0]: row[1] for row in conn.execute('DESCRIBE "segment"').fetchall()}
+        unknown_columns = set(segment_types) - {name for name, _ in base_columns}
+        if unknown_columns:
+            raise ValueError(f"Columns not in the dataset: {', '.join(sorted(unknown_columns))}")
+
+        select_list = []
+        for name, column_type in base_columns:
+            col = sql_identifier(name)
+            if name not in segment_types:
+                col = "NULL"
+            elif name in date_formats and segment_types[name] == "VARCHAR":
+                col = f"strptime({col}, {sql_string(date_formats[name])})"
+            select_list.append(f"CAST({col} AS {column_type}) AS {sql_identifier(name)}")
+        conn.execute(f'CREATE TABLE "{table_name}" AS SELECT {", ".join(select_list)} FROM "segment"')
+        export_parquet(conn, table_name, segment_path)
+        return conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+    finally:
+        conn.close()
+        if inflated_path:
+            remove_files(inflated_path)
+
+
+def build_duckdb_file(parquet_path, db_path, table_name="uploaded_csv", column_types=None):
+    """
+    Load the Parquet copy once into a native table inside an on-disk DuckDB file,
+    with the column types chosen at ingest.
+
+    Queries then run on DuckDB's own compressed storage, with zone maps, instead
+    of scanning a pandas DataFrame on every request. The database is built under
+    a temporary name and moved into place once it has been checkpointed.
+    """
+    tmp_path = f"{db_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        conn = duckdb.connect(tmp_path)
+        try:
+            conn.execute(f'CREATE TABLE "{table_name}" AS {typed_select(f"read_parquet({sql_string(parquet_path)})", column_types)}')
+            conn.execute("CHECKPOINT")
+        finally:
+            conn.close()
+        os.replace(tmp_path, db_path)
+    except Exception:
+        remove_files(tmp_path, f"{tmp_path}.wal")
+        raise
+
+
+def load_parquet(path):
+    """
+    Load the columnar copy of a dataset from a local path or URL.
+    """
+    return pd.read_parquet(path, engine="pyarrow")
@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# States of an ingest job that has not finished yet
+PENDING_STATES = ("queued", "running")
+
+
+class IngestJobQueue:
+    """
+    Runs dataset ingest jobs on a background thread pool.
+
+    Progress is written to each dataset's status.json in the dataset store, so
+    any worker on the host can report it, not only the one running the job.
+    A dataset has at most one job queued or running at a time.
+
+    The status of a pending job names the pid of its worker, and that worker
+    refreshes its heartbeat_at every heartbeat_seconds. read_status marks a
+    pending job failed once its worker has exited or its heartbeat is more
+    than stale_seconds old, so a worker that dies mid-job does not leave the
+    dataset pending forever. on_failed, if given, is called with the
+    dataset_id of every job that fails either way.
+    """
+
+    def __init__(self, store, max_workers, heartbeat_seconds=30, stale_seconds=120, on_failed=None):
+        self.store = store
+        self.on_failed = on_failed
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._futures = {}
+        self._statuses = {}  # dataset_id -> last status written for a pending job
+        self._lock = threading.RLock()
+        self._heartbeat = None
+
+    def _write_status(self, dataset_id, state, stage, progress, error=None):
+        status = {
+            "dataset_id": dataset_id,
+            "state": state,
+            "stage": stage,
+            "progress": round(progress, 2),
+            "updated_at": datetime.utcnow().isoformat(),
+            "pid": os.getpid(),
+            "heartbeat_at": time.time()
+        }
+        if error:
+            status["error"] = error
+        # The lock keeps a heartbeat from writing back a status the job has moved past
+        with self._lock:
+            self._statuses[dataset_id] = status
+            self.store.write_status(dataset_id, status)
+
+    def _beat(self):
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            with self._lock:
+                for dataset_id in list(self._futures):
+                    status = self._statuses.get(dataset_id)
+                    if status is not None and status["state"] in PENDING_STATES:
+                        status["heartbeat_at"] = time.time()
+                        self.store.write_status(dataset_id, status)
+
+    def _is_stale(self, status):
+        if time.time() - status.get("heartbeat_at", 0) > self.stale_seconds:
+            return True
+        try:
+            os.kill(status["pid"], 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    def read_status(self, dataset_id):
+        """
+        Return the latest ingest job status for a dataset, or None if it has
+        none. A pending job whose worker stopped is marked failed first.
+        """
+        status = self.store.read_status(dataset_id)
+        if status is None or status["state"] not in PENDING_STATES or not self._is_stale(status):
+            return status
+        print(f"❌ Ingest of dataset {dataset_id[:12]} was abandoned by worker {status.get('pid')}")
+        status = {
+            **status,
+            "state": "failed",
+            "stage": "failed",
+            "updated_at": datetime.utcnow().isoformat(),
+            "error": "The worker running this ingest stopped before it finished. Please upload the file again."
+        }
+        self.store.write_status(dataset_id, status)
+        self._failed(dataset_id)
+        return status
+
+    def _failed(self, dataset_id):
+        if self.on_failed is None:
+            return
+        try:
+            self.on_failed(dataset_id)
+        except Exception as e:
+            print(f"❌ Cleanup after the failed ingest of dataset {dataset_id[:12]} failed: {str(e)}")
+
+    def submit(self, dataset_id, job, *args):
+        """
+        Queue job(report, *args) for dataset_id, unless one is already pending.
+
+        The job calls report(stage, progress) as it moves through its steps, with
+        progress between 0 and 1. Returns the job's Future.
+        """
+        with self._lock:
+            future = self._futures.get(dataset_id)
+            if future is not None and not future.done():
+                return future
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._beat, name="ingest-heartbeat", daemon=True)
+                self._heartbeat.start()
+            self._write_status(dataset_id, "queued", "queued", 0.0)
+            future = self._executor.submit(self._run, dataset_id, job, args)
+            self._futures[dataset_id] = future
+            return future
+
+    def _run(self, dataset_id, job, args):
+        def report(stage, progress):
+            self._write_status(dataset_id, "running", stage, progress)
+
+        try:
+            job(report, *args)
+            self._write_status(dataset_id, "ready", "done", 1.0)
+            print(f"✅ Ingest finished for dataset {dataset_id[:12]}")
+        except Exception as e:
+            print(f"❌ Ingest failed for dataset {dataset_id[:12]}: {str(e)}")
+            self._write_status(dataset_id, "failed", "failed", 1.0, error=str(e))
+            self._failed(dataset_id)
+        finally:
+            with self._lock:
+                self._futures.pop(dataset_id, None)
+                self._statuses.pop(dataset_id, None)
+
+
+def run_every(interval, task, name):
+    """
+    Call task() every interval seconds on a daemon thread, logging failures.
+    """
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                task()
+            except Exception as e:
+                print(f"❌ {name} pass failed: {str(e)}")
+
+    threading.Thread(target=loop, name=name, daemon=True).start()
+
+
+class BackgroundTasks:
+    """
+    Runs best-effort work, such as replacing an estimated profile with an exact
+    one, on a background thread pool. Unlike ingest jobs these have no status
+    to report; failures are logged and the work is simply not done. A key has
+    at most one task queued or running at a time.
+    """
+
+    def __init__(self, max_workers, name="background"):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, task, *args):
+        """
+        Queue task(*args) under key, unless one is already pending. Returns its Future.
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None and not future.done():
+                return future
+            future = self._executor.submit(self._run, key, task, args)
+            self._futures[key] = future
+            return future
+
+    def _run(self, key, task, args):
+        try:
+            task(*args)
+        except Exception as e:
+            print(f"❌ {self.name} task failed for {key[:12]}: {str(e)}")
+        finally:
+            with self._lock:
+                self._futures.pop(key, None)
@@ -0,0 +1,70 @@
+import fcntl
+import json
+import os
+import re
+import uuid
+from contextlib import contextmanager
+
+
+def is_store_id(value, digits):
+    """
+    True if value is an id of lowercase hex digits of the given length, such as
+    a dataset_id (64) or an id made with uuid4().hex (32).
+    """
+    return isinstance(value, str) and re.fullmatch(f"[0-9a-f]{{{digits}}}", value) is not None
+
+
+def checked_id(value, name, digits):
+    """
+    Return value if it is a store id of the given length, else raise KeyError.
+
+    Ids come from clients and name files and directories on disk; only
+    accepting ids we generate means they cannot escape the store.
+    """
+    if not is_store_id(value, digits):
+        raise KeyError(f"Invalid {name}: {value}")
+    return value
+
+
+def read_json(path):
+    """
+    Return the parsed JSON file at path, or None if it is missing or unreadable.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_json(path, data, compact=False):
+    """
+    Atomically replace a JSON file so concurrent readers never see a partial
+    file. Compact files have no whitespace, for large files read often.
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            if compact:
+                json.dump(data, f, separators=(",", ":"), default=str)
+            else:
+                json.dump(data, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Hold an exclusive lock on the file at path, across all workers on the host,
+    for the duration of the block. The file is created if needed.
+    """
+    with open(path, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,44 @@
+import threading
+from collections import OrderedDict
+
+
+class ProfileCache:
+    """
+    Least-recently-used cache of dataset profiles (schema_info) in a worker's
+    memory, keyed by (dataset_id, version).
+
+    Versions never change, so entries are exact: an append creates a new key
+    and leaves the entries of older versions valid for requests still reading
+    them. Profiles are small, so the budget is a number of entries.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, dataset_id, version):
+        """
+        Return the cached profile of a dataset version, or None on a miss.
+        """
+        key = (dataset_id, version)
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is not None:
+                self._profiles.move_to_end(key)
+            return profile
+
+    def put(self, dataset_id, version, profile):
+        with self._lock:
+            self._profiles[(dataset_id, version)] = profile
+            self._profiles.move_to_end((dataset_id, version))
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+
+    def evict_dataset(self, dataset_id):
+        """
+        Drop the cached profiles of every version of a dataset.
+        """
+        with self._lock:
+            for key in [key for key in self._profiles if key[0] == dataset_id]:
+                del self._profiles[key]
@@ -0,0 +1,105 @@
+import hashlib
+import os
+import shutil
+import uuid
+
+from local_files import file_lock, read_json, write_json
+
+
+class UsageIndex:
+    """
+    Storage charged to each user against their quota.
+
+    Each user has a JSON file under <root>/_usage mapping charge keys to bytes,
+    so checking a quota reads one small file instead of every dataset. A key is
+    a dataset_id, or "upload-<upload_id>" for a chunked upload whose chunks are
+    still arriving. Uploads are charged an estimate as soon as they are
+    accepted, so files being sent or ingested count like stored ones; the
+    charge is settled to the dataset's stored bytes once its ingest finishes,
+    or released if it fails. The files are shared by all workers on the host.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.join(root, "_usage")
+
+    def exists(self):
+        return os.path.isdir(self.root)
+
+    def _path(self, user_id, suffix=".json"):
+        # User ids come from tokens, so the file is named by their hash
+        return os.path.join(self.root, hashlib.sha256(user_id.encode("utf-8")).hexdigest() + suffix)
+
+    def _read(self, user_id):
+        return read_json(self._path(user_id)) or {"user_id": user_id, "charges": {}}
+
+    def charges(self, user_id):
+        return self._read(user_id)["charges"]
+
+    def used_bytes(self, user_id):
+        return sum(self.charges(user_id).values())
+
+    def users(self):
+        """
+        Return {user_id: charges} for every user with an index file.
+        """
+        users = {}
+        for name in os.listdir(self.root) if self.exists() else []:
+            if name.endswith(".json"):
+                usage = read_json(os.path.join(self.root, name))
+                if usage is not None:
+                    users[usage["user_id"]] = usage["charges"]
+        return users
+
+    def reserve(self, user_id, key, nbytes, quota, releases=None):
+        """
+        Charge nbytes to user_id under key, replacing any charge already under
+        key or under releases, unless that takes the user over quota (0 means
+        no limit). Returns False, changing nothing, if it does not fit.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with file_lock(self._path(user_id, ".lock")):
+            usage = self._read(user_id)
+            charges = usage["charges"]
+            others = sum(size for name, size in charges.items() if name not in (key, releases))
+            if quota and others + nbytes > quota:
+                return False
+            charges.pop(releases, None)
+            charges[key] = nbytes
+            write_json(self._path(user_id), usage)
+            return True
+
+    def charge(self, user_id, key, nbytes):
+        """
+        Set the charge under key whatever the quota, for bytes already stored.
+        """
+        self.reserve(user_id, key, nbytes, quota=0)
+
+    def release(self, user_id, key):
+        if not os.path.exists(self._path(user_id)):
+            return
+        with file_lock(self._path(user_id, ".lock")):
+            usage = self._read(user_id)
+            if usage["charges"].pop(key, None) is not None:
+                write_json(self._path(user_id), usage)
+
+    def rebuild(self, charges):
+        """
+        Create the index from (user_id, key, nbytes) charges, such as those of
+        datasets stored before the index existed. The index is built aside and
+        moved into place, so if several workers rebuild at once one of them wins.
+        """
+        users = {}
+        for user_id, key, nbytes in charges:
+            users.setdefault(user_id, {})[key] = nbytes
+        tmp_root = f"{self.root}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_root)
+        try:
+            for user_id, user_charges in users.items():
+                name = os.path.basename(self._path(user_id))
+                write_json(os.path.join(tmp_root, name), {"user_id": user_id, "charges": user_charges})
+            os.rename(tmp_root, self.root)
+        except OSError:
+            if not self.exists():
+                raise
+        finally:
+            shutil.rmtree(tmp_root, ignore_errors=True)
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from local_files import read_json, write_json
+
+
+class RemoteFileCache:
+    """
+    Local on-disk cache of remote dataset files, keyed by URL.
+
+    A cached file is revalidated with If-None-Match / If-Modified-Since on every
+    fetch, so an unchanged file costs a single 304 response instead of a full
+    download. While a file is downloaded its content hash is computed with
+    hasher_factory and stored with the entry. Once the cached files go over
+    max_bytes, the least recently used ones are removed.
+    """
+
+    def __init__(self, cache_dir, max_bytes, hasher_factory, chunk_size=8 * 1024 * 1024, timeout=60):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hasher_factory = hasher_factory
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.data", f"{base}.json"
+
+    def fetch(self, url):
+        """
+        Return the cache entry for url, downloading the file only if it is not
+        cached or the server reports it changed.
+
+        The entry is a dict with the local "path", the "content_hash" of the
+        file, its "size" and the validators the server sent.
+        """
+        data_path, meta_path = self._paths(url)
+        entry = read_json(meta_path)
+        if entry is not None and not os.path.exists(data_path):
+            entry = None
+
+        request = urllib.request.Request(url)
+        if entry is not None:
+            if entry.get("etag"):
+                request.add_header("If-None-Match", entry["etag"])
+            if entry.get("last_modified"):
+                request.add_header("If-Modified-Since", entry["last_modified"])
+
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and entry is not None:
+                entry["last_access"] = time.time()
+                write_json(meta_path, entry, compact=True)
+                return entry
+            raise
+
+        with response:
+            hasher = self.hasher_factory()
+            size = 0
+            tmp_path = f"{data_path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    while True:
+                        chunk = response.read(self.chunk_size)
+                        if not chunk:
+                            break
+                        hasher.update(chunk)
+                        f.write(chunk)
+                        size += len(chunk)
+                os.replace(tmp_path, data_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            entry = {
+                "url": url,
+                "path": data_path,
+                "content_hash": hasher.hexdigest(),
+                "size": size,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "last_access": time.time()
+            }
+        write_json(meta_path, entry, compact=True)
+        self.evict(keep=data_path)
+        return entry
+
+    def _entries(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                meta_path = os.path.join(self.cache_dir, name)
+                entry = read_json(meta_path)
+                if entry is not None:
+                    yield meta_path, entry
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used files until the cache fits in max_bytes.
+        The file at keep is never removed, even if it alone exceeds the cap.
+        """
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda item: item[1].get("last_access", 0))
+            total = sum(entry["size"] for _, entry in entries)
+            for meta_path, entry in entries:
+                if total <= self.max_bytes:
+                    break
+                if entry["path"] == keep:
+                    continue
+                for path in (entry["path"], meta_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                total -= entry["size"]
+                print(f"♻️ Evicted {entry['url']} from remote cache ({entry['size']} bytes)")
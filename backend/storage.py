@@ -0,0 +1,86 @@
+import os
+import shutil
+import urllib.request
+import uuid
+
+import cloudinary.uploader
+import pyarrow as pa
+
+
+class StorageBackend:
+    """
+    Durable home of uploaded datasets and their Parquet copies.
+
+    put() stores a local file under a key and returns its location, which is
+    what gets saved as filePath / parquetPath. open() reads a location back as
+    a binary stream and raises KeyError for locations the backend does not own.
+    """
+
+    def put(self, local_path, key):
+        raise NotImplementedError
+
+    def open(self, location):
+        raise NotImplementedError
+
+
+class CloudinaryStorage(StorageBackend):
+    """
+    Stores files in Cloudinary as raw resources and reads them back over HTTPS.
+    """
+
+    def put(self, local_path, key):
+        upload_result = cloudinary.uploader.upload_large(local_path, resource_type="raw", public_id=key)
+        return upload_result["secure_url"]
+
+    def open(self, location):
+        if not location.startswith(("http://", "https://")):
+            raise KeyError(f"Not a Cloudinary location: {location}")
+        return urllib.request.urlopen(location)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Stores files on a local disk or shared volume.
+
+    Files are hard-linked into place when the volume allows it, so storing a
+    dataset that was just ingested on the same disk copies nothing. Reads use
+    memory-mapped files rather than buffered reads.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _resolve(self, location):
+        path = os.path.realpath(location)
+        if not path.startswith(self.root + os.sep):
+            raise KeyError(f"Not a local storage location: {location}")
+        return path
+
+    def put(self, local_path, key):
+        path = self._resolve(os.path.join(self.root, key))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.link(local_path, tmp_path)
+        except OSError:
+            shutil.copyfile(local_path, tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def open(self, location):
+        path = self._resolve(location)
+        if not os.path.exists(path):
+            raise KeyError(f"No stored file at {location}")
+        return pa.memory_map(path, "r")
+
+
+def create_storage_backend(name, local_dir):
+    """
+    Build the storage backend selected by the STORAGE_BACKEND setting.
+    """
+    if name == "cloudinary":
+        return CloudinaryStorage()
+    if name == "local":
+        return LocalStorage(local_dir)
+    raise ValueError(f"Unknown storage backend: {name}")
@@ -0,0 +1,217 @@
+import importlib
+import io
+import os
+import threading
+import time
+
+import jwt
+import pytest
+
+
+@pytest.fixture(scope="module")
+def app_module(tmp_path_factory):
+    root = tmp_path_factory.mktemp("app")
+    os.environ.update({
+        "DATASET_DIR": str(root / "data"),
+        "STORAGE_BACKEND": "local",
+        "LOCAL_STORAGE_DIR": str(root / "storage"),
+        "TIERING_INTERVAL_SECONDS": "0",
+    })
+    return importlib.import_module("app")
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def csv_file(rows, start=0):
+    lines = ["id,city"] + [f"{i},c{i % 3}" for i in range(start, start + rows)]
+    return io.BytesIO(("\n".join(lines) + "\n").encode())
+
+
+def auth(app_module, user_id):
+    return {"Authorization": f"Bearer {jwt.encode({'user_id': user_id}, app_module.jwt_secret, algorithm='HS256')}"}
+
+
+def wait_ready(client, dataset_id):
+    for _ in range(200):
+        status = client.get(f"/datasets/{dataset_id}/status").get_json()
+        if status["state"] in ("ready", "failed"):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"dataset {dataset_id} never became ready")
+
+
+def test_upload_during_ingest_adds_an_owner_and_keeps_the_source(app_module, client, monkeypatch):
+    release = threading.Event()
+    run_ingest_job = app_module.run_ingest_job
+
+    def blocked_ingest_job(report, source_path, metadata):
+        release.wait(10)
+        run_ingest_job(report, source_path, metadata)
+
+    monkeypatch.setattr(app_module, "run_ingest_job", blocked_ingest_job)
+    first = client.post("/upload_file", data={"file": (csv_file(50), "a.csv")}, headers=auth(app_module, "u1"))
+    dataset_id = first.get_json()["dataset_id"]
+    source = os.stat(app_module.dataset_store.source_path(dataset_id))
+
+    second = client.post("/upload_file", data={"file": (csv_file(50), "a.csv")}, headers=auth(app_module, "u2"))
+    assert second.status_code == 202
+    assert second.get_json()["duplicate"] is True
+    assert os.stat(app_module.dataset_store.source_path(dataset_id)).st_ino == source.st_ino
+
+    release.set()
+    assert wait_ready(client, dataset_id)["state"] == "ready"
+    assert app_module.dataset_store.read_metadata(dataset_id)["owners"] == ["u1", "u2"]
+
+
+def upload(app_module, client, user_id, data):
+    response = client.post("/upload_file", data={"file": (data, "data.csv")}, headers=auth(app_module, user_id))
+    dataset_id = response.get_json()["dataset_id"]
+    assert wait_ready(client, dataset_id)["state"] == "ready"
+    return dataset_id
+
+
+def row_count(app_module, dataset_id, version=None):
+    conn = app_module.open_dataset_connection(dataset_id, version)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM uploaded_csv").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_append_makes_a_new_dataset_and_leaves_uploads_of_the_file_unchanged(app_module, client):
+    original = upload(app_module, client, "u1", csv_file(200))
+    response = client.post(f"/datasets/{original}/append", data={"file": (csv_file(1, start=200), "more.csv")},
+                           headers=auth(app_module, "u1"))
+    assert response.status_code == 201
+    appended = response.get_json()["dataset_id"]
+    assert appended != original
+    assert response.get_json()["total_rows"] == 201
+
+    again = client.post("/upload_file", data={"file": (csv_file(200), "data.csv")}, headers=auth(app_module, "u2"))
+    assert again.get_json()["duplicate"] is True
+    assert again.get_json()["dataset_id"] == original
+    assert row_count(app_module, original) == 200
+    assert row_count(app_module, appended) == 201
+    assert app_module.dataset_store.read_metadata(original)["owners"] == ["u1", "u2"]
+    assert app_module.dataset_store.read_metadata(appended)["owners"] == ["u1"]
+
+    # The new dataset's history starts with the parent's versions
+    versions = client.get(f"/datasets/{appended}/versions").get_json()
+    assert versions["current_version"] == 1
+    assert [version["total_rows"] for version in versions["versions"]] == [200, 201]
+    assert row_count(app_module, appended, 0) == 200
+
+    retry = client.post(f"/datasets/{original}/append", data={"file": (csv_file(1, start=200), "more.csv")},
+                        headers=auth(app_module, "u1"))
+    assert retry.status_code == 200
+    assert retry.get_json()["dataset_id"] == appended
+    assert retry.get_json()["duplicate"] is True
+
+
+def test_only_owners_may_append(app_module, client):
+    dataset_id = upload(app_module, client, "u1", csv_file(30))
+    response = client.post(f"/datasets/{dataset_id}/append", data={"file": (csv_file(1, start=30), "more.csv")},
+                           headers=auth(app_module, "u3"))
+    assert response.status_code == 403
+
+
+def test_appended_rows_are_merged_into_the_profile(app_module, client):
+    dataset_id = upload(app_module, client, "u1", csv_file(100))
+    response = client.post(f"/datasets/{dataset_id}/append", data={"file": (csv_file(50, start=100), "more.csv")},
+                           headers=auth(app_module, "u1"))
+    appended = response.get_json()["dataset_id"]
+
+    profile = client.get(f"/datasets/{appended}/profile").get_json()["profile"]
+    columns = {col["name"]: col for col in profile["columns"]}
+    assert profile["total_rows"] == 150
+    assert columns["id"]["non_null_count"] == 150
+    assert (columns["id"]["min_value"], columns["id"]["max_value"]) == (0, 149)
+    assert columns["city"]["unique_values"] == 3
+    assert client.get(f"/datasets/{dataset_id}/profile").get_json()["profile"]["total_rows"] == 100
+
+
+def test_workspace_is_only_created_with_known_datasets_and_changed_by_its_owner(app_module, client):
+    before = os.listdir(app_module.workspace_store.root)
+    response = client.post("/workspaces", json={"dataset_ids": ["0" * 64]}, headers=auth(app_module, "u1"))
+    assert response.status_code == 404
+    assert os.listdir(app_module.workspace_store.root) == before
+
+    dataset_id = upload(app_module, client, "u1", csv_file(10))
+    workspace_id = client.post("/workspaces", json={"dataset_ids": [dataset_id]},
+                               headers=auth(app_module, "u1")).get_json()["workspace_id"]
+    added = client.post(f"/workspaces/{workspace_id}/tables", json={"dataset_id": dataset_id, "name": "other"},
+                        headers=auth(app_module, "u2"))
+    assert added.status_code == 403
+    removed = client.delete(f"/workspaces/{workspace_id}/tables/data", headers=auth(app_module, "u2"))
+    assert removed.status_code == 403
+    assert client.delete(f"/workspaces/{workspace_id}/tables/data", headers=auth(app_module, "u1")).status_code == 200
+
+
+def test_uploads_are_charged_from_the_start_and_settled_when_stored(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "user_quota_bytes", 1000)
+    headers = auth(app_module, "u4")
+    first = client.post("/uploads", json={"filename": "a.csv", "size": 400}, headers=headers)
+    assert first.status_code == 201
+    # The first upload has not sent a chunk yet, but it already counts
+    second = client.post("/uploads", json={"filename": "b.csv", "size": 400}, headers=headers)
+    assert second.status_code == 413
+    client.delete(f"/uploads/{first.get_json()['upload_id']}")
+    assert app_module.usage_index.used_bytes("u4") == 0
+
+    release = threading.Event()
+    run_ingest_job = app_module.run_ingest_job
+    monkeypatch.setattr(app_module, "run_ingest_job",
+                        lambda report, *args: (release.wait(10), run_ingest_job(report, *args)))
+    data = csv_file(40, start=1000)
+    size = len(data.getvalue())
+    dataset_id = client.post("/upload_file", data={"file": (data, "c.csv")}, headers=headers).get_json()["dataset_id"]
+    assert app_module.usage_index.used_bytes("u4") == 2 * size
+    release.set()
+    wait_ready(client, dataset_id)
+    stored_bytes = app_module.dataset_store.read_metadata(dataset_id)["stored_bytes"]
+    assert app_module.usage_index.charges("u4") == {dataset_id: stored_bytes}
+
+
+def test_failed_ingest_releases_its_charge(app_module, client):
+    response = client.post("/upload_file", data={"file": (io.BytesIO(b"PK\x03\x04 not a workbook"), "bad.xlsx")},
+                           headers=auth(app_module, "u5"))
+    assert wait_ready(client, response.get_json()["dataset_id"])["state"] == "failed"
+    assert app_module.usage_index.used_bytes("u5") == 0
+
+
+def test_datasets_without_owners_cannot_be_appended_to(app_module, client):
+    dataset_id = upload(app_module, client, "u1", csv_file(20, start=500))
+    metadata = app_module.dataset_store.read_metadata(dataset_id)
+    del metadata["owners"]
+    app_module.dataset_store.write_metadata(dataset_id, metadata)
+    response = client.post(f"/datasets/{dataset_id}/append", data={"file": (csv_file(1, start=520), "more.csv")},
+                           headers=auth(app_module, "u1"))
+    assert response.status_code == 403
+
+
+def test_housekeeping_deletes_abandoned_uploads_and_releases_their_charge(app_module, client, monkeypatch):
+    upload_id = client.post("/uploads", json={"filename": "a.csv", "size": 100},
+                            headers=auth(app_module, "u6")).get_json()["upload_id"]
+    assert app_module.usage_index.used_bytes("u6") == 200
+
+    monkeypatch.setattr(app_module, "upload_session_ttl", -1)
+    app_module.run_housekeeping()
+    assert client.get(f"/uploads/{upload_id}").status_code == 404
+    assert app_module.usage_index.used_bytes("u6") == 0
+
+
+def test_versions_of_a_dataset_still_being_ingested_are_not_listed(app_module, client, monkeypatch):
+    release = threading.Event()
+    run_ingest_job = app_module.run_ingest_job
+    monkeypatch.setattr(app_module, "run_ingest_job",
+                        lambda report, *args: (release.wait(10), run_ingest_job(report, *args)))
+    dataset_id = client.post("/upload_file", data={"file": (csv_file(10, start=2000), "d.csv")},
+                             headers=auth(app_module, "u1")).get_json()["dataset_id"]
+    assert client.get(f"/datasets/{dataset_id}/versions").status_code == 409
+    assert client.get(f"/datasets/{dataset_id}/versions/0").status_code == 404
+    release.set()
+    wait_ready(client, dataset_id)
+    assert client.get(f"/datasets/{dataset_id}/versions").get_json()["current_version"] == 0
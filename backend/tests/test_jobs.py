@@ -0,0 +1,41 @@
+import subprocess
+import sys
+import time
+
+from dataset_store import DatasetStore
+from jobs import IngestJobQueue
+
+DATASET_ID = "ab" * 32
+
+
+def test_job_of_an_exited_worker_is_marked_failed(tmp_path):
+    store = DatasetStore(str(tmp_path))
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    store.write_status(DATASET_ID, {
+        "dataset_id": DATASET_ID, "state": "running", "stage": "converting", "progress": 0.1,
+        "pid": exited.pid, "heartbeat_at": time.time()
+    })
+
+    status = IngestJobQueue(store, max_workers=1).read_status(DATASET_ID)
+    assert status["state"] == "failed"
+    assert store.read_status(DATASET_ID)["state"] == "failed"
+
+
+def test_running_job_keeps_its_heartbeat(tmp_path):
+    store = DatasetStore(str(tmp_path))
+    queue = IngestJobQueue(store, max_workers=1, heartbeat_seconds=0.05, stale_seconds=0.2)
+    future = queue.submit(DATASET_ID, lambda report: (report("converting", 0.1), time.sleep(0.6)))
+    time.sleep(0.4)
+    assert queue.read_status(DATASET_ID)["state"] == "running"
+    future.result()
+    assert queue.read_status(DATASET_ID)["state"] == "ready"
+
+
+def test_job_without_heartbeats_is_marked_failed(tmp_path):
+    store = DatasetStore(str(tmp_path))
+    store.write_status(DATASET_ID, {
+        "dataset_id": DATASET_ID, "state": "queued", "stage": "queued", "progress": 0.0,
+        "pid": 1, "heartbeat_at": time.time() - 60
+    })
+    assert IngestJobQueue(store, max_workers=1, stale_seconds=30).read_status(DATASET_ID)["state"] == "failed"
@@ -0,0 +1,59 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import duckdb
+import pytest
+
+from profiling import HyperLogLog, process_pool, profile_database_table, profile_relation
+
+
+@pytest.mark.parametrize("distinct", [30_000, 40_000, 50_000])
+def test_estimate_of_short_string_keys(distinct):
+    # DuckDB's hash() spreads keys like these poorly; they used to come out 6-13% low
+    conn = duckdb.connect()
+    schema_info = profile_relation(conn, f"(SELECT 'k' || i AS key FROM range({distinct}) t(i))")
+    estimate = schema_info["columns"][0]["unique_values"]
+    assert abs(estimate - distinct) <= 0.03 * distinct
+    assert schema_info["columns"][0]["estimated"] == ["unique_values"]
+
+
+def test_merged_sketches_estimate_the_union():
+    conn = duckdb.connect()
+    sketches = []
+    for start in (0, 20_000):
+        column_sketches = {}
+        profile_relation(conn, f"(SELECT 'k' || i AS key FROM range({start}, {start + 40_000}) t(i))",
+                         sketches=column_sketches)
+        sketches.append(column_sketches["key"])
+    estimate = sketches[0].merge(sketches[1]).estimate()
+    assert abs(estimate - 60_000) <= 0.03 * 60_000
+
+
+def test_empty_sketch_estimates_zero():
+    assert HyperLogLog().estimate() == 0
+
+
+def test_profile_recovers_from_a_killed_pool_process(tmp_path):
+    db_path = str(tmp_path / "wide.duckdb")
+    with duckdb.connect(db_path) as conn:
+        conn.execute(f"CREATE TABLE t AS SELECT {', '.join(f'i + {n} AS c{n}' for n in range(32))} FROM range(1000) r(i)")
+    assert len(profile_database_table(db_path, "t", workers=2)["columns"]) == 32
+
+    with process_pool(2) as pool:
+        with pytest.raises(BrokenProcessPool):
+            pool.submit(os._exit, 1).result()
+    schema_info = profile_database_table(db_path, "t", workers=2)
+    assert [col["non_null_count"] for col in schema_info["columns"]] == [1000] * 32
+    with process_pool(2) as new_pool:
+        assert new_pool is not pool
+
+
+def test_idle_pool_is_shut_down():
+    with process_pool(3, idle_seconds=0.1) as pool:
+        assert pool.submit(os.getpid).result() != os.getpid()
+    time.sleep(0.5)
+    with pytest.raises(RuntimeError):
+        pool.submit(os.getpid)
+    with process_pool(3, idle_seconds=0.1) as new_pool:
+        assert new_pool is not pool
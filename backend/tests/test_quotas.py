@@ -0,0 +1,22 @@
+from quotas import UsageIndex
+
+
+def test_reserve_refuses_charges_over_the_quota(tmp_path):
+    index = UsageIndex(str(tmp_path))
+    assert index.reserve("u1", "upload-a", 600, quota=1000)
+    assert not index.reserve("u1", "upload-b", 600, quota=1000)
+    # Moving a charge to another key only counts it once
+    assert index.reserve("u1", "dataset", 900, quota=1000, releases="upload-a")
+    assert index.charges("u1") == {"dataset": 900}
+    index.release("u1", "dataset")
+    assert index.used_bytes("u1") == 0
+
+
+def test_rebuild_indexes_existing_charges(tmp_path):
+    index = UsageIndex(str(tmp_path))
+    assert not index.exists()
+    index.rebuild([("u1", "a", 10), ("u1", "b", 5), ("u2", "a", 10)])
+    assert index.users() == {"u1": {"a": 10, "b": 5}, "u2": {"a": 10}}
+    # Another worker's index is kept
+    UsageIndex(str(tmp_path)).rebuild([("u3", "c", 1)])
+    assert index.used_bytes("u3") == 0
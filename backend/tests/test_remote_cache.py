@@ -0,0 +1,117 @@
+import hashlib
+import http.server
+import os
+import threading
+
+import pytest
+
+from dataset_store import new_dataset_hasher
+from remote_cache import RemoteFileCache
+
+
+class FileServer:
+    """
+    Local HTTP stand-in for a remote dataset host. Serves files from a dict,
+    answers If-None-Match with 304 when the ETag still matches, and counts
+    full downloads per path.
+    """
+
+    def __init__(self):
+        self.files = {}  # path -> (content, etag)
+        self.downloads = {}
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in server.files:
+                    self.send_error(404)
+                    return
+                content, etag = server.files[self.path]
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                server.downloads[self.path] = server.downloads.get(self.path, 0) + 1
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+    def serve(self, path, content):
+        self.files[path] = (content, f'"{hashlib.sha256(content).hexdigest()[:16]}"')
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = FileServer()
+    yield server
+    server.close()
+
+
+def make_cache(tmp_path, max_bytes=1024 * 1024):
+    return RemoteFileCache(str(tmp_path / "cache"), max_bytes=max_bytes, hasher_factory=new_dataset_hasher, chunk_size=64)
+
+
+def test_unchanged_file_is_revalidated_without_download(server, tmp_path):
+    content = b"id,value\n1,a\n2,b\n"
+    server.serve("/data.csv", content)
+    cache = make_cache(tmp_path)
+
+    first = cache.fetch(server.url("/data.csv"))
+    second = cache.fetch(server.url("/data.csv"))
+
+    assert server.downloads["/data.csv"] == 1
+    assert second["path"] == first["path"]
+    assert second["content_hash"] == hashlib.sha256(content).hexdigest()
+    with open(second["path"], "rb") as f:
+        assert f.read() == content
+
+
+def test_changed_etag_downloads_file_again(server, tmp_path):
+    server.serve("/data.csv", b"id\n1\n")
+    cache = make_cache(tmp_path)
+    cache.fetch(server.url("/data.csv"))
+
+    server.serve("/data.csv", b"id\n1\n2\n")
+    entry = cache.fetch(server.url("/data.csv"))
+
+    assert server.downloads["/data.csv"] == 2
+    assert entry["content_hash"] == hashlib.sha256(b"id\n1\n2\n").hexdigest()
+    with open(entry["path"], "rb") as f:
+        assert f.read() == b"id\n1\n2\n"
+
+
+def test_least_recently_used_files_are_evicted_over_budget(server, tmp_path):
+    for name in ("a", "b", "c"):
+        server.serve(f"/{name}.csv", name.encode() * 100)
+    cache = make_cache(tmp_path, max_bytes=250)
+
+    a = cache.fetch(server.url("/a.csv"))
+    b = cache.fetch(server.url("/b.csv"))
+    # Using a again makes b the least recently used file
+    cache.fetch(server.url("/a.csv"))
+    c = cache.fetch(server.url("/c.csv"))
+
+    assert os.path.exists(a["path"])
+    assert not os.path.exists(b["path"])
+    assert os.path.exists(c["path"])
+    assert sum(os.path.getsize(entry["path"]) for entry in (a, c)) <= 250
+
+    # The evicted file is downloaded again on its next use
+    cache.fetch(server.url("/b.csv"))
+    assert server.downloads["/b.csv"] == 2
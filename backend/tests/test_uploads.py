@@ -0,0 +1,21 @@
+import io
+import os
+import time
+
+from uploads import UploadSessionStore
+
+
+def test_sessions_unused_for_max_age_expire(tmp_path):
+    store = UploadSessionStore(str(tmp_path), max_chunk_size=10)
+    idle = store.create("a.csv", 20, 10)
+    active = store.create("b.csv", 20, 10)
+    store.write_chunk(idle["upload_id"], 0, io.BytesIO(b"0" * 10))
+    store.write_chunk(active["upload_id"], 0, io.BytesIO(b"0" * 10))
+
+    hour_ago = time.time() - 3600
+    for path in (store._dir(idle["upload_id"]), os.path.join(store._dir(idle["upload_id"]), "chunks")):
+        os.utime(path, (hour_ago, hour_ago))
+
+    assert [session["upload_id"] for session in store.expire(600)] == [idle["upload_id"]]
+    assert not os.path.exists(store._dir(idle["upload_id"]))
+    assert store.missing_chunks(active["upload_id"]) == [1]
@@ -0,0 +1,190 @@
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+# Order of the storage tiers, from fastest to cheapest
+TIERS = ("hot", "warm", "cold")
+# Files rebuilt from the Parquet copy when a warm dataset is used again
+HOT_FILES = ("source", "data.duckdb", "data.duckdb.wal", "partitions")
+
+
+class DatasetTiering:
+    """
+    Moves datasets between storage tiers by how recently they were used.
+
+    - hot: the DuckDB database, and the partitioned copy if any, are on local
+      disk;
+    - warm: only the compressed Parquet copy and appended segments stay on
+      local disk;
+    - cold: the data lives only in the storage backend. The dataset directory
+      keeps its metadata, manifests, profiles and sketches.
+
+    Datasets are never promoted here: ensure_local_copy rebuilds whatever is
+    missing the next time a dataset is used, which makes it hot again. Each
+    use is recorded in the dataset's access.json, and run() demotes datasets
+    that have not been used for hot_seconds or warm_seconds. If the local
+    copies still take more than max_local_bytes, the least recently used
+    datasets are demoted further.
+    """
+
+    def __init__(self, store, hot_seconds, warm_seconds, max_local_bytes=0, access_write_interval=60):
+        self.store = store
+        self.hot_seconds = hot_seconds
+        self.warm_seconds = warm_seconds
+        self.max_local_bytes = max_local_bytes
+        self.access_write_interval = access_write_interval
+        self._pending_access = {}  # dataset_id -> (uses since last write, time of last write)
+        self._lock = threading.Lock()
+
+    def record_access(self, dataset_id):
+        """
+        Count a use of the dataset. access.json is rewritten at most once per
+        access_write_interval per worker, so frequent queries cost no extra I/O.
+        """
+        now = time.time()
+        with self._lock:
+            uses, written_at = self._pending_access.get(dataset_id, (0, 0))
+            uses += 1
+            if now - written_at < self.access_write_interval:
+                self._pending_access[dataset_id] = (uses, written_at)
+                return
+            self._pending_access[dataset_id] = (0, now)
+        access = self.store.read_json(dataset_id, "access.json") or {"count": 0}
+        access["count"] += uses
+        access["last_accessed_at"] = now
+        self.store.write_json(dataset_id, "access.json", access)
+
+    def last_access(self, dataset_id):
+        """
+        Time of the dataset's last recorded use, or of its ingest if it has none.
+        """
+        access = self.store.read_json(dataset_id, "access.json")
+        if access and access.get("last_accessed_at"):
+            return access["last_accessed_at"]
+        return os.path.getmtime(self.store.dataset_dir(dataset_id))
+
+    def tier(self, dataset_id):
+        if self.store.has_duckdb(dataset_id):
+            return "hot"
+        if self.store.has_parquet(dataset_id):
+            return "warm"
+        return "cold"
+
+    def local_bytes(self, dataset_id):
+        # Files a fork shares with its parent through hard links count for both
+        total = 0
+        for root, _, files in os.walk(self.store.dataset_dir(dataset_id)):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except FileNotFoundError:
+                    pass
+        return total
+
+    def can_go_cold(self, metadata):
+        """
+        A dataset may leave local disk only once its Parquet copy and every
+        appended segment are in the storage backend.
+        """
+        return bool(metadata.get("parquetPath")) and all(
+            segment.get("parquetPath") for segment in metadata.get("segments", [])
+        )
+
+    def demote(self, dataset_id, tier):
+        """
+        Remove the local files a dataset does not keep in tier. Returns True if
+        the dataset moved; datasets still being ingested, or that cannot go cold
+        yet, are left alone.
+        """
+        with self.store.lock(dataset_id):
+            status = self.store.read_status(dataset_id)
+            metadata = self.store.read_metadata(dataset_id)
+            if metadata is None or (status is not None and status["state"] != "ready"):
+                return False
+            if TIERS.index(tier) <= TIERS.index(self.tier(dataset_id)):
+                return False
+            if tier == "cold" and not self.can_go_cold(metadata):
+                return False
+
+            names = list(HOT_FILES)
+            if tier == "cold":
+                names.append("data.parquet")
+                names += [os.path.join("segments", f"{s['segment_id']}.parquet") for s in metadata.get("segments", [])]
+            for name in names:
+                path = self.store.path(dataset_id, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                elif os.path.exists(path):
+                    os.remove(path)
+
+        print(f"🧊 Moved dataset {dataset_id[:12]} to the {tier} tier")
+        return True
+
+    def run(self, now=None):
+        """
+        Demote idle datasets, then the least recently used ones while local
+        copies exceed max_local_bytes. Returns the moves made, as dicts with
+        dataset_id, from and to.
+        """
+        now = now or time.time()
+        datasets = []
+        for dataset_id in self.store.list_datasets():
+            try:
+                datasets.append((self.last_access(dataset_id), dataset_id))
+            except FileNotFoundError:
+                continue
+        datasets.sort()
+
+        moves = []
+
+        def move(dataset_id, tier):
+            current = self.tier(dataset_id)
+            if self.demote(dataset_id, tier):
+                moves.append({"dataset_id": dataset_id, "from": current, "to": tier})
+
+        for last_access, dataset_id in datasets:
+            idle = now - last_access
+            if idle > self.warm_seconds:
+                move(dataset_id, "cold")
+            elif idle > self.hot_seconds:
+                move(dataset_id, "warm")
+
+        if self.max_local_bytes:
+            local_bytes = {dataset_id: self.local_bytes(dataset_id) for _, dataset_id in datasets}
+            for tier in ("warm", "cold"):
+                for _, dataset_id in datasets:
+                    if sum(local_bytes.values()) <= self.max_local_bytes:
+                        return moves
+                    move(dataset_id, tier)
+                    local_bytes[dataset_id] = self.local_bytes(dataset_id)
+        return moves
+
+    def usage(self):
+        """
+        Storage used per tier and by every dataset. Stored bytes are what a
+        dataset takes in the storage backend, local bytes what its files take
+        on this host.
+        """
+        tiers = {tier: {"datasets": 0, "local_bytes": 0} for tier in TIERS}
+        datasets = []
+        for dataset_id in self.store.list_datasets():
+            metadata = self.store.read_metadata(dataset_id)
+            if metadata is None:
+                continue
+            tier = self.tier(dataset_id)
+            local_bytes = self.local_bytes(dataset_id)
+            stored_bytes = metadata.get("stored_bytes", 0)
+            tiers[tier]["datasets"] += 1
+            tiers[tier]["local_bytes"] += local_bytes
+            datasets.append({
+                "dataset_id": dataset_id,
+                "filename": metadata.get("filename"),
+                "owners": metadata.get("owners", []),
+                "tier": tier,
+                "stored_bytes": stored_bytes,
+                "local_bytes": local_bytes,
+                "last_accessed_at": datetime.utcfromtimestamp(self.last_access(dataset_id)).isoformat()
+            })
+        return {"tiers": tiers, "datasets": datasets}
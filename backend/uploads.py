@@ -0,0 +1,178 @@
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+
+from local_files import checked_id, is_store_id, read_json, write_json
+
+
+class UploadSessionStore:
+    """
+    Resumable chunked uploads.
+
+    A session is created with the file's total size and a chunk size, which fix
+    how many numbered chunks make up the file. Each session is a directory under
+    <root>/_uploads holding session.json and one file per received chunk, plus a
+    small JSON with the chunk's size and SHA-256. Chunks are independent, so
+    clients may send them in parallel and in any order, and resend only the ones
+    missing after a dropped connection. Sessions that receive nothing for a
+    while are removed by expire(). The directory is shared by all workers on
+    the host.
+    """
+
+    def __init__(self, root, max_chunk_size):
+        self.root = os.path.join(root, "_uploads")
+        self.max_chunk_size = max_chunk_size
+        os.makedirs(self.root, exist_ok=True)
+
+    def _dir(self, upload_id):
+        return os.path.join(self.root, checked_id(upload_id, "upload_id", 32))
+
+    def _chunk_path(self, upload_id, index, suffix=".part"):
+        return os.path.join(self._dir(upload_id), "chunks", f"{index:06d}{suffix}")
+
+    def get(self, upload_id):
+        """
+        Return the session, or raise KeyError if it does not exist.
+        """
+        session = read_json(os.path.join(self._dir(upload_id), "session.json"))
+        if session is None:
+            raise KeyError(f"Unknown upload_id: {upload_id}")
+        return session
+
+    def create(self, filename, total_size, chunk_size, **fields):
+        """
+        Start a session for a file of total_size bytes sent in chunks of
+        chunk_size bytes (the last one may be shorter). Extra fields are kept
+        with the session for use when it is completed.
+        """
+        if not isinstance(total_size, int) or total_size <= 0:
+            raise ValueError("size must be a positive number of bytes")
+        if not isinstance(chunk_size, int) or not 0 < chunk_size <= self.max_chunk_size:
+            raise ValueError(f"chunk_size must be between 1 and {self.max_chunk_size} bytes")
+        session = {
+            "upload_id": uuid.uuid4().hex,
+            "filename": filename,
+            "size": total_size,
+            "chunk_size": chunk_size,
+            "chunk_count": -(-total_size // chunk_size),
+            "created_at": datetime.utcnow().isoformat(),
+            **fields
+        }
+        os.makedirs(os.path.join(self._dir(session["upload_id"]), "chunks"))
+        write_json(os.path.join(self._dir(session["upload_id"]), "session.json"), session)
+        return session
+
+    def expected_chunk_size(self, session, index):
+        if index == session["chunk_count"] - 1:
+            return session["size"] - index * session["chunk_size"]
+        return session["chunk_size"]
+
+    def write_chunk(self, upload_id, index, stream, checksum=None, read_size=1024 * 1024):
+        """
+        Stream one chunk to disk, hashing it on the way. The chunk is kept only if
+        its size is the one the session expects for that index and, when the
+        client sent one, its SHA-256 matches checksum. Raises ValueError otherwise.
+        Resending a chunk replaces it. Returns the chunk's size and SHA-256.
+        """
+        session = self.get(upload_id)
+        if not 0 <= index < session["chunk_count"]:
+            raise ValueError(f"Chunk index must be between 0 and {session['chunk_count'] - 1}")
+        expected_size = self.expected_chunk_size(session, index)
+
+        path = self._chunk_path(upload_id, index)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                while True:
+                    data = stream.read(read_size)
+                    if not data:
+                        break
+                    size += len(data)
+                    if size > expected_size:
+                        raise ValueError(f"Chunk {index} is larger than {expected_size} bytes")
+                    hasher.update(data)
+                    f.write(data)
+            if size != expected_size:
+                raise ValueError(f"Chunk {index} has {size} bytes, expected {expected_size}")
+            if checksum and checksum.lower() != hasher.hexdigest():
+                raise ValueError(f"Checksum mismatch for chunk {index}")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        chunk = {"index": index, "size": size, "sha256": hasher.hexdigest()}
+        write_json(self._chunk_path(upload_id, index, ".json"), chunk)
+        return chunk
+
+    def received_chunks(self, upload_id):
+        """
+        Return the chunks received so far, in index order.
+        """
+        chunks_dir = os.path.join(self._dir(upload_id), "chunks")
+        chunks = []
+        for name in sorted(os.listdir(chunks_dir)):
+            if not name.endswith(".json"):
+                continue
+            chunk = read_json(os.path.join(chunks_dir, name))
+            if chunk is not None:
+                chunks.append(chunk)
+        return chunks
+
+    def missing_chunks(self, upload_id):
+        session = self.get(upload_id)
+        received = {chunk["index"] for chunk in self.received_chunks(upload_id)}
+        return [index for index in range(session["chunk_count"]) if index not in received]
+
+    def assemble(self, upload_id, path, hasher, read_size=1024 * 1024):
+        """
+        Concatenate all chunks, in order, into path, updating hasher with every
+        byte. Raises ValueError if any chunk is missing.
+        """
+        missing = self.missing_chunks(upload_id)
+        if missing:
+            raise ValueError(f"Missing chunks: {missing[:20]}")
+        session = self.get(upload_id)
+        with open(path, "wb") as out:
+            for index in range(session["chunk_count"]):
+                with open(self._chunk_path(upload_id, index), "rb") as f:
+                    while True:
+                        data = f.read(read_size)
+                        if not data:
+                            break
+                        hasher.update(data)
+                        out.write(data)
+
+    def delete(self, upload_id):
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+    def expire(self, max_age, now=None):
+        """
+        Delete the sessions that have received no chunk for max_age seconds and
+        return them. Writing a chunk updates the mtime of the chunks directory,
+        so that is when a session was last used.
+        """
+        now = now or time.time()
+        expired = []
+        for upload_id in os.listdir(self.root):
+            if not is_store_id(upload_id, 32):
+                continue
+            try:
+                last_used = max(
+                    os.path.getmtime(self._dir(upload_id)),
+                    os.path.getmtime(os.path.join(self._dir(upload_id), "chunks"))
+                )
+            except FileNotFoundError:
+                last_used = 0
+            if now - last_used <= max_age:
+                continue
+            session = read_json(os.path.join(self._dir(upload_id), "session.json"))
+            self.delete(upload_id)
+            if session is not None:
+                expired.append(session)
+        return expired
@@ -0,0 +1,102 @@
+import os
+import re
+import uuid
+from datetime import datetime
+
+from local_files import checked_id, file_lock, read_json, write_json
+
+# Extensions stripped from upload names when deriving table names
+DATASET_FILE_EXTENSIONS = {".csv", ".txt", ".json", ".jsonl", ".ndjson", ".parquet", ".xlsx", ".gz", ".zst", ".bz2"}
+
+
+def table_name_for_file(filename, taken=()):
+    """
+    Derive a SQL-friendly table name from an uploaded file's name, e.g.
+    "Customer Orders 2024.csv.gz" -> "customer_orders_2024". A numeric suffix
+    is added when the name is already in use.
+    """
+    stem = os.path.basename(filename or "")
+    while os.path.splitext(stem)[1].lower() in DATASET_FILE_EXTENSIONS:
+        stem = os.path.splitext(stem)[0]
+    name = re.sub(r"[^0-9a-z]+", "_", stem.lower()).strip("_") or "table"
+    if name[0].isdigit():
+        name = f"t_{name}"
+    candidate, n = name, 2
+    while candidate in taken:
+        candidate, n = f"{name}_{n}", n + 1
+    return candidate
+
+
+class WorkspaceStore:
+    """
+    Workspaces group several datasets so they can be queried together.
+
+    Each workspace is a JSON file under <root>/_workspaces naming its owner and
+    listing its tables: a table name, derived from the uploaded file's name,
+    and the dataset_id behind it. The files are shared by all workers on the host.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.join(root, "_workspaces")
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, workspace_id, suffix=".json"):
+        return os.path.join(self.root, f"{checked_id(workspace_id, 'workspace_id', 32)}{suffix}")
+
+    def _locked(self, workspace_id):
+        return file_lock(self._path(workspace_id, ".lock"))
+
+    def _write(self, workspace):
+        write_json(self._path(workspace["workspace_id"]), workspace)
+
+    def get(self, workspace_id):
+        """
+        Return the workspace, or raise KeyError if it does not exist.
+        """
+        workspace = read_json(self._path(workspace_id))
+        if workspace is None:
+            raise KeyError(f"Unknown workspace_id: {workspace_id}")
+        return workspace
+
+    def create(self, owner):
+        workspace = {
+            "workspace_id": uuid.uuid4().hex,
+            "owner": owner,
+            "created_at": datetime.utcnow().isoformat(),
+            "tables": []
+        }
+        self._write(workspace)
+        return workspace
+
+    def add_table(self, workspace_id, dataset_id, filename=None, name=None):
+        """
+        Add a dataset to the workspace under name, or under a name derived from
+        filename. A dataset already in the workspace keeps its existing name.
+        Returns the table entry.
+        """
+        with self._locked(workspace_id):
+            workspace = self.get(workspace_id)
+            for table in workspace["tables"]:
+                if table["dataset_id"] == dataset_id:
+                    return table
+            taken = {table["name"] for table in workspace["tables"]}
+            if name:
+                if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+                    raise ValueError(f"Invalid table name: {name}")
+                if name in taken:
+                    raise ValueError(f"Table name already in use: {name}")
+            else:
+                name = table_name_for_file(filename, taken)
+            table = {"name": name, "dataset_id": dataset_id}
+            workspace["tables"].append(table)
+            self._write(workspace)
+            return table
+
+    def remove_table(self, workspace_id, name):
+        with self._locked(workspace_id):
+            workspace = self.get(workspace_id)
+            tables = [table for table in workspace["tables"] if table["name"] != name]
+            if len(tables) == len(workspace["tables"]):
+                raise KeyError(f"Unknown table: {name}")
+            workspace["tables"] = tables
+            self._write(workspace)
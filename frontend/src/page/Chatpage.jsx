@@ -29,6 +29,7 @@ const ChatPage = () => {
   const [isLoading, setIsLoading] = useState(false);
   const [display, setDisplay] = useState(false);
   const [filePath, setfilePath] = useState(null);
+  const [datasetId, setDatasetId] = useState(null);
   const [isDropdownOpen, setIsDropdownOpen] = useState(false);
   const [badgeCount, setBadgeCount] = useState(0);
   const [loading, setLoading] = useState(false);
@@ -56,6 +57,12 @@ const ChatPage = () => {
   const chatRecognition = useRef({});
   const interruptRecognition = useRef({}); // For detecting interruptions during AI speech
   const url = "https://dashboard-agent-2.onrender.com";
+  // Files up to this size are hashed in the browser to detect re-uploads. WebCrypto
+  // only hashes a whole buffer, so the file is held in memory while it is hashed;
+  // larger files are uploaded and deduplicated by the backend instead
+  const MAX_PRECHECK_HASH_BYTES = 32 * 1024 * 1024;
+  // Longest wait for an uploaded file to be processed before giving up
+  const INGEST_TIMEOUT_MS = 30 * 60 * 1000;
   
   // Show loading screen while checking authentication
   if (userLoading) {
@@ -200,6 +207,7 @@ const ChatPage = () => {
     setBadgeCount(1);
     setIsDropdownOpen(false);
     setfilePath(data);
+    setDatasetId(null);
   };
 
   const setDefaultQuery = (data) => {
@@ -207,26 +215,86 @@ const ChatPage = () => {
     setUserQueryy(data);
   };
 
+  const waitForDataset = async (datasetId) => {
+    const deadline = Date.now() + INGEST_TIMEOUT_MS;
+    while (true) {
+      if (Date.now() > deadline) {
+        throw new Error('File processing is taking too long. Please try again later.');
+      }
+      const res = await axios.get(`${url}/datasets/${datasetId}/status`);
+      if (res.data.state === 'ready') {
+        return res.data;
+      }
+      if (res.data.state === 'failed') {
+        throw new Error(res.data.error || 'File processing failed.');
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+  };
+
+  // SHA-256 of the file, which is the dataset_id the backend assigns to it
+  const hashFile = async (file) => {
+    const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    return Array.from(new Uint8Array(digest)).map((b) => b.toString(16).padStart(2, '0')).join('');
+  };
+
+  // Skip the upload entirely when the backend already has this exact file
+  const findExistingDataset = async (file) => {
+    if (!window.crypto?.subtle || file.size > MAX_PRECHECK_HASH_BYTES) {
+      return null;
+    }
+    try {
+      const existingId = await hashFile(file);
+      const res = await axios.get(`${url}/datasets/${existingId}/status`);
+      if (res.data.state !== 'ready') {
+        return null;
+      }
+      // Record the user as an uploader, as the upload would, so it counts against their quota
+      const token = localStorage.getItem('dashboardAgent_token');
+      const claimed = await axios.post(`${url}/datasets/${existingId}/owners`, null, {
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+      });
+      return claimed.data;
+    } catch (error) {
+      return null;
+    }
+  };
+
   const uploadFile = async (file) => {
     if (!file) {
       throw new Error('No file provided for upload.');
     }
 
+    const existing = await findExistingDataset(file);
+    if (existing) {
+      setfilePath(existing.filePath);
+      setDatasetId(existing.dataset_id);
+      alert("File uploaded successfully!");
+      return existing;
+    }
+
     const formData = new FormData();
     formData.append('file', file);
 
+    // Signed-in uploads count against the user's storage quota
+    const token = localStorage.getItem('dashboardAgent_token');
+
     try {
       const res = await axios.post(`${url}/upload_file`, formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
+          ...(token ? { Authorization: `Bearer ${token}` } : {}),
         },
       });
-      setfilePath(res.data.filePath);
+      // Processing runs in the background; wait until the dataset is ready to query
+      const status = await waitForDataset(res.data.dataset_id);
+      setfilePath(status.filePath);
+      setDatasetId(res.data.dataset_id);
       alert("File uploaded successfully!");
-      return res.data;
+      return status;
     } catch (error) {
       console.error('Error uploading file:', error);
-      throw new Error(error.response?.data?.error || 'File upload failed.');
+      throw new Error(error.response?.data?.error || error.message || 'File upload failed.');
     }
   };
 
@@ -272,6 +340,7 @@ const ChatPage = () => {
       const res = await axios.post(`${url}/generate_sql`, {
         text: queryToSend,
         filePath: filePath,
+        dataset_id: datasetId,
       }, { responseType: 'blob' });
 
       const reader = new FileReader();
@@ -1301,7 +1370,9 @@ const ChatPage = () => {
     try {
       const response = await axios.post(`${url}/analyze_data`, {
         query: query,
-        data: data
+        data: data,
+        dataset_id: datasetId,
+        filePath: filePath
       });
 
       if (response.data.success) {
@@ -1755,7 +1826,9 @@ const ChatPage = () => {
         user_question: userQuestion,
         data: conversation.data,
         original_query: conversation.query,
-        conversation_history: chatConversations[conversationId] || []
+        conversation_history: chatConversations[conversationId] || [],
+        dataset_id: datasetId,
+        filePath: filePath
       });
 
       if (response.data.success) {
@@ -2872,7 +2945,7 @@ const ChatPage = () => {
                   id="file-upload"
                   className="hidden"
                   onChange={(e) => uploadFile(e.target.files[0])}
-                  accept=".csv,.txt"
+                  accept=".csv,.txt,.json,.jsonl,.ndjson,.parquet,.xlsx,.gz,.zst,.bz2"
                 />
                 <label
                   htmlFor="file-upload"